@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+from file_lock import locked
+
+# ===== Corpus-Wide ANN Index =====
+# One inverted-file (IVF) index per board/class/subject partition. Chunk
+# embeddings are bucketed under their nearest k-means centroid; a query only
+# scores the chunks in the few buckets closest to it.
+INDEX_DIR = os.getenv('ANN_INDEX_DIR', 'index')
+DEFAULT_NPROBE = int(os.getenv('ANN_NPROBE', '4'))
+KMEANS_ITERATIONS = 10
+# Re-cluster once the partition has doubled since the last training run
+RETRAIN_GROWTH = 2.0
+
+def _slug(value):
+    return re.sub(r'[^a-z0-9]+', '', str(value).lower())
+
+def partition_key(board, class_level, subject):
+    """Normalized partition name, e.g. ('NCERT', 'Class 10', 'Maths') -> 'ncert_10_maths'"""
+    digits = re.search(r'\d+', str(class_level))
+    class_key = digits.group() if digits else _slug(class_level)
+    return f"{_slug(board)}_{class_key}_{_slug(subject)}"
+
+def partition_from_path(file_path):
+    """Partition for an object path like 'NCERT/Class 10/Maths/chapter (1).pdf'"""
+    parts = file_path.strip('/').split('/')
+    if len(parts) < 4:
+        return None
+    return partition_key(parts[0], parts[1], parts[2])
+
+def _spherical_kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster normalized vectors by cosine similarity"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                if norm > 0:
+                    centroids[c] = centroid / norm
+
+    return centroids, np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+class IVFIndex:
+    """Inverted-file index over normalized chunk embeddings of one partition"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.entries = []
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self._build_lists()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def source_generations(self):
+        """{source: chunk-store generation it was indexed from} (None for entries older than generations)"""
+        return {entry['source']: entry.get('generation') for entry in self.entries}
+
+    def _build_lists(self):
+        # CSR layout: rows of list c are order[offsets[c]:offsets[c + 1]]
+        nlist = 0 if self.centroids is None else len(self.centroids)
+        self.order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments, minlength=nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def _train(self):
+        nlist = max(1, int(np.sqrt(len(self.vectors))))
+        self.centroids, self.assignments = _spherical_kmeans(self.vectors, nlist)
+        self.trained_size = len(self.vectors)
+
+    def add(self, vectors, entries):
+        """Insert new rows, assigning them to existing centroids when possible"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not len(vectors):
+            return
+
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.entries.extend(entries)
+
+        if self.centroids is None or len(self.vectors) >= self.trained_size * RETRAIN_GROWTH:
+            self._train()
+        else:
+            new_assignments = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+            self.assignments = np.concatenate([self.assignments, new_assignments])
+        self._build_lists()
+
+    def remove_source(self, source):
+        """Drop every row that came from one chapter (used when it is re-ingested)"""
+        keep = np.array([entry['source'] != source for entry in self.entries], dtype=bool)
+        if keep.all():
+            return
+        self.vectors = self.vectors[keep]
+        self.assignments = self.assignments[keep]
+        self.entries = [entry for entry, kept in zip(self.entries, keep) if kept]
+        self._build_lists()
+
+    def search(self, query_embedding, top_k=3, nprobe=DEFAULT_NPROBE):
+        """Return [(entry, score)] for the best rows in the nprobe closest lists"""
+        if not self.entries:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+        if not len(candidates):
+            return []
+
+        scores = self.vectors[candidates] @ query
+        top_k = min(top_k, len(candidates))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(self.entries[candidates[i]], float(scores[i])) for i in best]
+
+    def save(self, path):
+        """Write the whole index as one .npz file, replaced atomically"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                vectors=self.vectors,
+                assignments=self.assignments,
+                centroids=self.centroids if self.centroids is not None else np.zeros((0, self.dim), dtype=np.float32),
+                trained_size=np.array(self.trained_size),
+                entries=np.array(json.dumps(self.entries))
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(data['vectors'].shape[1])
+            index.vectors = data['vectors'].astype(np.float32)
+            index.assignments = data['assignments'].astype(np.int32)
+            index.centroids = data['centroids'] if len(data['centroids']) else None
+            index.trained_size = int(data['trained_size'])
+            index.entries = json.loads(str(data['entries']))
+        index._build_lists()
+        return index
+
+# ===== Partition Registry =====
+_indexes = {}
+_index_mtimes = {}
+_registry_lock = threading.Lock()
+
+def get_index_path(partition):
+    return os.path.join(INDEX_DIR, f"{partition}.npz")
+
+def get_index(partition):
+    """Return the partition's index, reloading it if another worker updated the file"""
+    path = get_index_path(partition)
+    with _registry_lock:
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime is not None and _index_mtimes.get(partition) != mtime:
+            _indexes[partition] = IVFIndex.load(path)
+            _index_mtimes[partition] = mtime
+        return _indexes.get(partition)
+
+def load_all_indexes():
+    """Load every persisted partition, e.g. when a worker starts"""
+    if not os.path.isdir(INDEX_DIR):
+        return []
+    partitions = [name[:-4] for name in os.listdir(INDEX_DIR) if name.endswith('.npz')]
+    for partition in partitions:
+        get_index(partition)
+    return partitions
+
+def is_indexed(file_path, generation):
+    """Whether the partition holds this chapter as of the given chunk-store generation"""
+    partition = partition_from_path(file_path)
+    index = get_index(partition) if partition else None
+    if index is None:
+        return False
+    generations = index.source_generations()
+    return file_path in generations and generations[file_path] == generation
+
+def index_chapter(file_path, chunks, embeddings, generation=None):
+    """Insert (or replace) one chapter's chunks in its partition's index"""
+    partition = partition_from_path(file_path)
+    if partition is None or not len(chunks):
+        return False
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    path = get_index_path(partition)
+
+    # File lock so concurrent workers never overwrite each other's insertions
+    with locked(f"{path}.lock"):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # Work on a fresh copy so in-flight searches keep a consistent snapshot
+        if os.path.exists(path):
+            index = IVFIndex.load(path)
+        else:
+            index = IVFIndex(embeddings.shape[1])
+        index.remove_source(file_path)
+        index.add(embeddings, [
+            {'source': file_path, 'generation': generation, 'chunk': i, 'text': chunk}
+            for i, chunk in enumerate(chunks)
+        ])
+        index.save(path)
+
+        with _registry_lock:
+            _indexes[partition] = index
+            _index_mtimes[partition] = os.path.getmtime(path)
+    return True
+
+def partition_version(board, class_level, subject):
+    """Short digest of the chapters and generations a partition holds; changes whenever one is (re)indexed"""
+    index = get_index(partition_key(board, class_level, subject))
+    if index is None:
+        return None
+    sources = sorted(index.source_generations().items())
+    return hashlib.sha1(json.dumps(sources).encode('utf-8')).hexdigest()[:12]
+
+def search_partition(board, class_level, subject, query_embedding, top_k=3, nprobe=DEFAULT_NPROBE):
+    """Search every ingested chapter of a board/class/subject at once"""
+    index = get_index(partition_key(board, class_level, subject))
+    if index is None:
+        return []
+    return index.search(query_embedding, top_k=top_k, nprobe=nprobe)
@@ -0,0 +1,231 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import closing
+import numpy as np
+from embeddings import normalize_query
+
+# ===== Semantic Answer Cache =====
+# Answers are cached per scope (a chapter's chunk file, or a subject partition)
+# and reused when a new question's embedding is close enough to a cached one.
+# Without an embedding (RETRIEVAL_MODE=bm25 never loads the model) a question
+# only matches a cached one with the same normalized text.
+# Entries live in memory for fast lookups and in SQLite so they survive restarts
+# and are shared by every worker on the host. A miss reads only the rows other
+# workers added to the scope since the last read, outside the lock. Hits only
+# note the time in memory; those last_used times reach SQLite in one batch at
+# most every ANSWER_CACHE_TOUCH_INTERVAL seconds or with the next store, which
+# is all LRU eviction needs. Callers put the chapter's generation in the scope,
+# so a re-ingested chapter starts a fresh scope instead of serving stale answers.
+ANSWER_CACHE_PATH = os.getenv('ANSWER_CACHE_PATH', 'answer_cache.sqlite3')
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95'))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '5000'))
+ANSWER_CACHE_TOUCH_INTERVAL = float(os.getenv('ANSWER_CACHE_TOUCH_INTERVAL', '30'))
+
+class SemanticAnswerCache:
+    """Similarity-keyed answer cache with TTL, LRU eviction and an SQLite backing store"""
+
+    def __init__(self, path=ANSWER_CACHE_PATH, threshold=ANSWER_CACHE_THRESHOLD,
+                 ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 touch_interval=ANSWER_CACHE_TOUCH_INTERVAL):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._scopes = {}  # scope -> {entry_id: entry}
+        self._entry_scopes = {}  # entry_id -> scope, to drop evicted ids from memory
+        self._loaded_ids = {}  # scope -> highest row id read from disk
+        self._touches = {}  # entry_id -> last_used not yet written to SQLite
+        self._touches_flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=10))
+
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with self._connect() as conn, conn:
+            # WAL lets workers read while another one writes
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " scope TEXT NOT NULL,"
+                " question TEXT NOT NULL,"
+                " embedding BLOB NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+            # Drop whatever expired while the process was down
+            conn.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self._initialized = True
+
+    def _read_scope(self, scope, after_id):
+        """Live rows of one scope added since row after_id, so answers written by other workers are visible"""
+        with self._connect() as conn, conn:
+            rows = conn.execute(
+                "SELECT id, question, embedding, answer, created_at, last_used FROM answers"
+                " WHERE scope = ? AND id > ? AND created_at >= ?",
+                (scope, after_id, time.time() - self.ttl)
+            ).fetchall()
+
+        entries = {}
+        for entry_id, question, embedding, answer, created_at, last_used in rows:
+            entries[entry_id] = {
+                'key': normalize_query(question),
+                'embedding': np.frombuffer(embedding, dtype=np.float32),
+                'answer': answer,
+                'created_at': created_at,
+                'last_used': last_used
+            }
+        return entries
+
+    def _best_match(self, entries, question, query_embedding):
+        now = time.time()
+        live = [(entry_id, entry) for entry_id, entry in entries.items()
+                if now - entry['created_at'] <= self.ttl]
+        if query_embedding is None:
+            key = normalize_query(question)
+            return next(((entry_id, entry) for entry_id, entry in live if entry['key'] == key), None)
+
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        # Entries stored without an embedding (bm25 mode) only match by text
+        live = [(entry_id, entry) for entry_id, entry in live
+                if entry['embedding'].shape == query_embedding.shape]
+        if not live:
+            return None
+
+        matrix = np.vstack([entry['embedding'] for _, entry in live])
+        scores = matrix @ query_embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return live[best]
+
+    def lookup(self, scope, question, query_embedding=None):
+        """Cached answer for a sufficiently similar question in this scope, or None"""
+        with self._lock:
+            self._ensure_initialized()
+            entries = self._scopes.get(scope)
+            if entries:
+                # Other workers evict rows too; at least let go of this scope's expired ones
+                cutoff = time.time() - self.ttl
+                for entry_id in [entry_id for entry_id, entry in entries.items() if entry['created_at'] < cutoff]:
+                    del entries[entry_id]
+                    self._entry_scopes.pop(entry_id, None)
+            match = self._best_match(entries, question, query_embedding) if entries else None
+            after_id = self._loaded_ids.get(scope, 0)
+
+        if match is None:
+            # Row ids only grow, so everything up to after_id has just been checked
+            new_entries = self._read_scope(scope, after_id)
+            with self._lock:
+                self._remember(scope, new_entries)
+            match = self._best_match(new_entries, question, query_embedding) if new_entries else None
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                return None
+
+            entry_id, entry = match
+            entry['last_used'] = time.time()
+            self._touches[entry_id] = entry['last_used']
+            self.hits += 1
+            touches = None
+            if time.monotonic() - self._touches_flushed_at >= self.touch_interval:
+                touches = self._take_touches()
+
+        if touches:
+            with self._connect() as conn, conn:
+                self._write_touches(conn, touches)
+        return entry['answer']
+
+    def _remember(self, scope, entries):
+        """Add rows read or written by this process to the in-memory scope; caller holds the lock"""
+        if not entries:
+            return
+        self._scopes.setdefault(scope, {}).update(entries)
+        for entry_id in entries:
+            self._entry_scopes[entry_id] = scope
+        self._loaded_ids[scope] = max(self._loaded_ids.get(scope, 0), max(entries))
+
+    def _take_touches(self):
+        """Pending last_used times, handed to the caller to write; caller holds the lock"""
+        touches, self._touches = self._touches, {}
+        self._touches_flushed_at = time.monotonic()
+        return touches
+
+    def _write_touches(self, conn, touches):
+        conn.executemany("UPDATE answers SET last_used = ? WHERE id = ?",
+                         [(last_used, entry_id) for entry_id, last_used in touches.items()])
+
+    def store(self, scope, question, query_embedding, answer):
+        now = time.time()
+        embedding = np.asarray(query_embedding if query_embedding is not None else [], dtype=np.float32)
+
+        with self._lock:
+            self._ensure_initialized()
+            touches = self._take_touches()
+
+        with self._connect() as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO answers (scope, question, embedding, answer, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, question, embedding.tobytes(), answer, now, now)
+            )
+            # Eviction ranks by last_used, so write the pending hits first
+            self._write_touches(conn, touches)
+            evicted = self._evict(conn)
+
+        with self._lock:
+            entry_id = cursor.lastrowid
+            self._scopes.setdefault(scope, {})[entry_id] = {
+                'key': normalize_query(question),
+                'embedding': embedding,
+                'answer': answer,
+                'created_at': now,
+                'last_used': now
+            }
+            self._entry_scopes[entry_id] = scope
+            for entry_id in evicted:
+                entries = self._scopes.get(self._entry_scopes.pop(entry_id, None))
+                if entries is not None:
+                    entries.pop(entry_id, None)
+
+    def _evict(self, conn):
+        """Delete expired answers and the least recently used ones past max_entries; the deleted ids"""
+        cutoff = time.time() - self.ttl
+        evicted = [row[0] for row in conn.execute("SELECT id FROM answers WHERE created_at < ?", (cutoff,))]
+        excess = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - len(evicted) - self.max_entries
+        if excess > 0:
+            evicted += [row[0] for row in conn.execute(
+                "SELECT id FROM answers WHERE created_at >= ? ORDER BY last_used LIMIT ?", (cutoff, excess)
+            )]
+        conn.executemany("DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in evicted])
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries_in_memory': sum(len(entries) for entries in self._scopes.values()),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,90 @@
+from clients import get_generative_model
+from answer_cache import answer_cache
+from embeddings import normalize_query
+from retrieval import cache_embedding
+from singleflight import answer_flight
+from llm_gate import llm_gate, LLMUnavailable
+
+# ===== Answer Generation =====
+# One prompt and one cached answer path for /api/ask and the chat blueprint.
+# The chat UI shows answers as plain text, so the blueprint passes
+# markdown=False: its prompt names the formatting without markdown markers,
+# and its answers are cached apart from /api/ask's.
+ANSWER_MODEL = "gemini-2.0-flash-001"
+NO_CONTEXT_ANSWER = "I couldn't find enough context to answer that question."
+ANSWER_ERROR = "I encountered an error while generating an answer. Please try again."
+
+def chapter_scope(chapter):
+    """Answer cache scope of one stored chapter; a re-ingest gets a new generation and so a fresh scope"""
+    return f"{chapter['key']}#{chapter['generation']}"
+
+def answer_cache_scope(scope, markdown=True):
+    """Answer cache scope for one answer format"""
+    return scope if markdown else f"plain|{scope}"
+
+def build_answer_prompt(context, query, markdown=True):
+    """Gemini prompt for answering a student question from retrieved context"""
+    bold, italics = ("**Bold**", "*Italics*") if markdown else ("Bold", "Italics")
+    return (
+        f"You are an expert educational assistant. Provide detailed, structured answers to student questions.\n\n"
+        f"Context:\n{context}\n\n"
+        f"Question: {query}\n\n"
+        f"Format your answer with:\n"
+        f"- {bold} for key terms\n"
+        f"- {italics} for emphasis\n"
+        f"- Lists for multiple items\n"
+        f"- Tables for comparative data\n"
+        f"- Headings for sections\n"
+        f"- Clear explanations with examples where needed\n\n"
+        f"Answer in detail, covering all relevant aspects from the context. "
+        f"If the question can't be answered from the context, say so explicitly.\n\n"
+        f"Answer:"
+    )
+
+def generate_answer(context, query, model_name=ANSWER_MODEL, markdown=True):
+    """Generate answer using Gemini model with proper error handling"""
+    try:
+        if not context or not query:
+            return NO_CONTEXT_ANSWER
+
+        model = get_generative_model(model_name)
+        response = llm_gate.call(model.generate_content, build_answer_prompt(context, query, markdown))
+        return response.text.strip()
+    except LLMUnavailable:
+        # Turned away by the gate: the route answers 503 with the gate's message
+        raise
+    except Exception as e:
+        print(f"Error generating answer: {str(e)}")
+        return ANSWER_ERROR
+
+def generate_answer_stream(context, query, model_name=ANSWER_MODEL, markdown=True):
+    """Yield the answer text piece by piece as Gemini produces it"""
+    model = get_generative_model(model_name)
+    prompt = build_answer_prompt(context, query, markdown)
+    for response in llm_gate.stream(model.generate_content, prompt, stream=True):
+        # Safety-filtered or empty candidates raise on .text, skip them
+        try:
+            text = response.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+def generate_answer_cached(scope, context, query, markdown=True):
+    """(answer, from_cache) from the answer cache, calling Gemini only on a miss"""
+    scope = answer_cache_scope(scope, markdown)
+    query_embedding = cache_embedding(query)
+    answer = answer_cache.lookup(scope, query, query_embedding)
+    if answer is not None:
+        return answer, True
+
+    def answer_once():
+        answer = generate_answer(context, query, markdown=markdown)
+        # Never cache fallbacks, or one upstream hiccup would be served for hours
+        if answer not in (NO_CONTEXT_ANSWER, ANSWER_ERROR):
+            answer_cache.store(scope, query, query_embedding, answer)
+        return answer
+
+    # The same question asked concurrently waits for one Gemini call
+    return answer_flight.do(f"{scope}|{normalize_query(query)}", answer_once,
+                            recheck=lambda: answer_cache.lookup(scope, query, query_embedding))
@@ -1,25 +1,40 @@
 import re
 import os
-import io
 import json
 
 import traceback
+from startup import lazy_import, run_once, mark_ready, startup_report
 from flask import Flask, request, jsonify, render_template, redirect, url_for, session
-from PyPDF2 import PdfReader
-from google.cloud import storage
-from sentence_transformers import SentenceTransformer
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
-import requests
 from functools import wraps
 from flask_mail import Mail, Message
 import random
 import time
+import threading
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from chat import chat_bp
+from answer_cache import answer_cache
+from profile_cache import profile_cache
+from clients import get_generative_model, get_http_session, HTTP_TIMEOUT
+from bucket_manifest import resolve_object_name
+from pdf_cache import pdf_cache_stats
+from chunk_store import chunk_store, load_chapter
+from context_packer import pack_context, context_budget, count_tokens, CONTEXT_CANDIDATES
+from quiz_bank import QuizBank
+from score_writer import ScoreWriter
+from mail_worker import MailQueue
+from singleflight import singleflight_stats
+from llm_gate import llm_gate, LLMUnavailable
+from ann_index import load_all_indexes
+from embeddings import warm_up_embedding_model, query_cache_stats
+from answers import build_answer_prompt, chapter_scope, generate_answer_cached
+from chapters import ingest_pdf, add_to_corpus_index, retrieve_relevant_chunks_with_scores
+
+# Heavy dependencies are imported on first use so the auth pages never pay for them
+firebase_admin = lazy_import('firebase_admin')
+credentials = lazy_import('firebase_admin.credentials')
+auth = lazy_import('firebase_admin.auth')
+firestore = lazy_import('firebase_admin.firestore')
 
 
 # Load environment variables
@@ -49,37 +64,53 @@ def initialize_firebase():
             raise
     return firestore.client()
 
-# Initialize Firebase when module loads
-try:
-    db = initialize_firebase()
-    app.logger.info("Firebase initialized successfully")
-except Exception as e:
-    db = None
-    app.logger.error(f"WARNING: Firebase initialization failed - {str(e)}")
+def ensure_firebase():
+    """Initialize Firebase on first use instead of at module load"""
+    run_once('firebase', initialize_firebase)
+
+def get_db():
+    """Return the Firestore client, initializing Firebase if needed"""
+    ensure_firebase()
+    return firestore.client()
+
+# Quiz scores are written behind the request in coalesced batches (see score_writer.py)
+score_writer = ScoreWriter(get_db, logger=app.logger)
 
 # ===== Configurations =====
-os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-project_id = os.getenv('PROJECT_ID')
-location = 'us-central1'
-aiplatform.init(project=project_id, location=location)
-
-# Initialize models
-try:
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    app.logger.info("Embedding model loaded successfully")
-except Exception as e:
-    app.logger.error(f"Failed to load embedding model: {str(e)}")
-    embedding_model = None
+if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+# Vertex AI is initialized lazily when the first Gemini model handle is created (clients.py)
+
+# Embedding model is shared with the chat blueprint and loaded on first use.
+# Set WARM_UP_EMBEDDINGS=1 to load it in the background as soon as the worker starts.
+def warm_up_models():
+    """Load the shared embedding model and the corpus indexes ahead of the first request"""
+    try:
+        warm_up_embedding_model()
+        app.logger.info("Embedding model loaded successfully")
+    except Exception as e:
+        app.logger.error(f"Failed to load embedding model: {str(e)}")
+    try:
+        partitions = load_all_indexes()
+        app.logger.info(f"Loaded {len(partitions)} corpus index partitions")
+    except Exception as e:
+        app.logger.error(f"Failed to load corpus indexes: {str(e)}")
+
+if os.getenv('WARM_UP_EMBEDDINGS', '0') == '1':
+    threading.Thread(target=warm_up_models, daemon=True).start()
 
 # Email configuration
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USE_SSL'] = False
+# MAIL_SERVER/MAIL_PORT/MAIL_USE_TLS can point at a local SMTP stand-in for tests
+app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', '587'))
+app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', '1') == '1'
+app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', '0') == '1'
 app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
 mail = Mail(app)
+# Emails are sent by a background worker (see mail_worker.py)
+mail_queue = MailQueue(app, mail)
 
 # ===== Helper Functions =====
 # def validate_pdf_path(path):
@@ -126,121 +157,15 @@ def validate_pdf_path(path):
     ]
     
     return any(re.match(p, chapter_file) for p in valid_patterns)
-def load_pdf_from_gcs(bucket_name, file_path):
-    """Load PDF content from Google Cloud Storage"""
-    try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(file_path)
-        
-        if not blob.exists():
-            raise FileNotFoundError(f"File not found at gs://{bucket_name}/{file_path}")
-            
-        return blob.download_as_bytes()
-    except Exception as e:
-        app.logger.error(f"Error loading PDF from GCS: {str(e)}")
-        raise
-
-def split_pdf_into_chunks(pdf_bytes, chunk_size=1000):
-    """Split PDF into manageable chunks with overlap"""
-    try:
-        pdf_stream = io.BytesIO(pdf_bytes)
-        reader = PdfReader(pdf_stream)
-        chunks = []
-        
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                # Split text into chunks with overlap
-                words = text.split()
-                for i in range(0, len(words), chunk_size):
-                    chunk = ' '.join(words[i:i+chunk_size])
-                    chunks.append(chunk)
-                    
-        return chunks
-    except Exception as e:
-        app.logger.error(f"Error splitting PDF: {str(e)}")
-        raise
-
-def get_chunks_filename(bucket_name, file_path):
-    """Generate consistent filename for storing chunks"""
-    safe_path = file_path.replace('/', '_').replace('.', '_')
-    return f"chunks/{bucket_name}_{safe_path}.json"
-
-def store_chunks(bucket_name, file_path, chunks):
-    """Store chunks in local filesystem with proper error handling"""
-    try:
-        chunks_filename = get_chunks_filename(bucket_name, file_path)
-        os.makedirs(os.path.dirname(chunks_filename), exist_ok=True)
-        
-        with open(chunks_filename, 'w') as f:
-            json.dump(chunks, f)
-    except Exception as e:
-        app.logger.error(f"Error storing chunks: {str(e)}")
-        raise
-
 def load_chunks(bucket_name, file_path):
-    """Load chunks from local filesystem with proper error handling"""
+    """Load a chapter's chunks and embeddings from the chunk store, or None if not ingested yet"""
     try:
-        chunks_filename = get_chunks_filename(bucket_name, file_path)
-        
-        if os.path.exists(chunks_filename):
-            with open(chunks_filename, 'r') as f:
-                return json.load(f)
-        return None
+        object_name = resolve_object_name(bucket_name, file_path)
+        return load_chapter(bucket_name, object_name, requested_path=file_path)
     except Exception as e:
         app.logger.error(f"Error loading chunks: {str(e)}")
         return None
 
-def retrieve_relevant_chunks(chunks, query, top_k=3):
-    """Retrieve most relevant chunks using semantic search"""
-    try:
-        if not chunks or not query:
-            return []
-            
-        query_embedding = embedding_model.encode([query])[0]
-        scored_chunks = []
-        
-        for chunk in chunks:
-            chunk_embedding = embedding_model.encode([chunk])[0]
-            # Use cosine similarity
-            score = sum(q * c for q, c in zip(query_embedding, chunk_embedding))
-            scored_chunks.append((score, chunk))
-            
-        scored_chunks.sort(reverse=True, key=lambda x: x[0])
-        return [chunk for _, chunk in scored_chunks[:top_k]]
-    except Exception as e:
-        app.logger.error(f"Error retrieving chunks: {str(e)}")
-        return []
-
-def generate_answer(context, query, model_name="gemini-2.0-flash-001"):
-    """Generate answer using Gemini model with proper error handling"""
-    try:
-        if not context or not query:
-            return "I couldn't find enough context to answer that question."
-            
-        model = GenerativeModel(model_name)
-        prompt = (
-            f"You are an expert educational assistant. Provide detailed, structured answers to student questions.\n\n"
-            f"Context:\n{context}\n\n"
-            f"Question: {query}\n\n"
-            f"Format your answer with:\n"
-            f"- **Bold** for key terms\n"
-            f"- *Italics* for emphasis\n"
-            f"- Lists for multiple items\n"
-            f"- Tables for comparative data\n"
-            f"- Headings for sections\n"
-            f"- Clear explanations with examples where needed\n\n"
-            f"Answer in detail, covering all relevant aspects from the context. "
-            f"If the question can't be answered from the context, say so explicitly.\n\n"
-            f"Answer:"
-        )
-        
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        app.logger.error(f"Error generating answer: {str(e)}")
-        return "I encountered an error while generating an answer. Please try again."
 # ===== Authentication Decorator =====
 def login_required(f):
     @wraps(f)
@@ -250,6 +175,31 @@ def login_required(f):
         return f(*args, **kwargs)
     return wrapper
 
+# ===== User Profile =====
+def get_user_uid():
+    """Firebase uid of the logged-in user, kept in the session since login"""
+    uid = session.get('uid')
+    if not uid:
+        # Sessions created before the uid was stored at login: look it up once
+        ensure_firebase()
+        user = auth.get_user_by_email(session.get('user'))
+        uid = session['uid'] = user.uid
+        session.setdefault('user_name', user.display_name)
+    return uid
+
+def get_user_profile():
+    """uid, email, name, board, class and stream of the logged-in user, or None without a profile document"""
+    uid = get_user_uid()
+    profile = profile_cache.get(uid)
+    if profile is None:
+        user_data = get_db().collection('users').document(uid).get().to_dict()
+        if not user_data:
+            return None
+        profile = profile_cache.put(uid, user_data)
+
+    profile.update(uid=uid, email=session.get('user'), name=session.get('user_name'))
+    return profile
+
 # ===== Routes =====
 @app.route('/')
 def index():
@@ -302,20 +252,18 @@ def get_user():
         if not user_email:
             return jsonify({'error': 'User not authenticated'}), 401
             
-        user = auth.get_user_by_email(user_email)
-        user_ref = db.collection('users').document(user.uid)
-        user_data = user_ref.get().to_dict()
+        user_data = get_user_profile()
         
         if not user_data:
             return jsonify({'error': 'User data not found'}), 404
         
         return jsonify({
             'user': {
-                'email': user.email,
-                'name': user.display_name,
-                'board': user_data.get('board', ''),
-                'class': user_data.get('class', ''),
-                'stream': user_data.get('stream', 'NA')
+                'email': user_data['email'],
+                'name': user_data['name'],
+                'board': user_data.get('board') or '',
+                'class': user_data.get('class') or '',
+                'stream': user_data.get('stream') or 'NA'
             }
         })
     except Exception as e:
@@ -343,12 +291,15 @@ def login():
             "returnSecureToken": True
         }
         
-        response = requests.post(url, json=payload)
+        response = get_http_session().post(url, json=payload, timeout=HTTP_TIMEOUT)
         result = response.json()
 
         if 'idToken' in result:
             session.permanent = True
             session['user'] = email
+            # The sign-in response already carries the uid; no Admin SDK lookup needed later
+            session['uid'] = result.get('localId')
+            session['user_name'] = result.get('displayName', '')
             return jsonify({'status': 'success'})
         else:
             error_msg = result.get('error', {}).get('message', 'Login failed')
@@ -404,7 +355,7 @@ def register():
         try:
             msg = Message('Your OTP for Email Verification', recipients=[email])
             msg.body = f"Your OTP is {otp}. It will expire in 5 minutes."
-            mail.send(msg)
+            mail_queue.send(msg)
             return jsonify({'status': 'success', 'message': 'OTP sent. Please verify your email.'})
         except Exception as e:
             session.pop('registration_data', None)
@@ -433,6 +384,7 @@ def verify_otp():
             return jsonify({'status': 'error', 'message': 'Invalid OTP'}), 400
 
         try:      
+            db = get_db()
             user = auth.create_user(
                 email=reg_data['email'],
                 password=reg_data['password'],
@@ -452,7 +404,9 @@ def verify_otp():
 
             session['user'] = user.email
             session['user_name'] = user.display_name
+            session['uid'] = user.uid
             session.pop('registration_data', None)
+            profile_cache.put(user.uid, reg_data)
 
             return jsonify({'status': 'success'})
         except auth.EmailAlreadyExistsError:
@@ -474,6 +428,9 @@ def verify_otp():
 @app.route('/api/logout', methods=['POST'])
 def logout():
     try:
+        # The next login reads the profile fresh
+        if session.get('uid'):
+            profile_cache.invalidate(session['uid'])
         session.clear()
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -484,12 +441,12 @@ def logout():
 @login_required
 def get_subjects():
     try:
-        user = auth.get_user_by_email(session.get('user'))
-        user_ref = db.collection('users').document(user.uid)
-        user_data = user_ref.get().to_dict()
+        user_data = get_user_profile()
+        if not user_data:
+            return jsonify({'error': 'User data not found'}), 404
         
-        class_level = user_data.get('class', '')
-        stream = user_data.get('stream', 'NA')
+        class_level = user_data.get('class') or ''
+        stream = user_data.get('stream') or 'NA'
         
         subjects = []
         
@@ -590,17 +547,8 @@ def save_score():
         except ValueError:
             return jsonify({'error': 'Invalid score format'}), 400
             
-        user = auth.get_user_by_email(session.get('user'))
-        user_ref = db.collection('users').document(user.uid)
-        
-        # Update the score and add timestamp
-        user_ref.update({
-            f'scores.{subject}': score,
-            f'scoreHistory.{subject}': firestore.ArrayUnion([{
-                'score': score,
-                'timestamp': firestore.SERVER_TIMESTAMP
-            }])
-        })
+        # Queued; the latest score and the history entry are written by the next flush
+        score_writer.submit(get_user_uid(), subject, score)
         
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -623,44 +571,31 @@ def submit_path():
         bucket_name = path.split('/')[2]
         file_path = "/".join(path.split('/')[3:])
 
-        # Try multiple path variations to find the PDF
-        pdf_content = None
-        path_variations = [
-            file_path,
-            file_path.replace("chapter (", "Chapter ").replace(").pdf", ".pdf"),
-            file_path.replace("Class ", "class "),  # Handle case sensitivity
-            file_path.replace("(", "").replace(")", "")  # Handle chapter (1).pdf → chapter 1.pdf
-        ]
-
-        for path_variant in path_variations:
-            try:
-                pdf_content = get_pdf_from_storage(bucket_name, path_variant)
-                file_path = path_variant  # Update to the successful path
-                break
-            except FileNotFoundError:
-                continue
-
-        if not pdf_content:
+        # Resolve whichever spelling of the chapter exists in the bucket
+        try:
+            file_path = resolve_object_name(bucket_name, file_path)
+        except FileNotFoundError:
             return jsonify({"error": "PDF not found (tried multiple path variations)"}), 404
 
-        chunks = load_chunks(bucket_name, file_path)
-        if chunks is None:
+        chapter = load_chunks(bucket_name, file_path)
+        if chapter is None:
             try:
-                chunks = split_pdf_into_chunks(pdf_content)
-                store_chunks(bucket_name, file_path, chunks)
+                chapter = ingest_pdf(bucket_name, file_path)
+                add_to_corpus_index(file_path, chapter)
                 return jsonify({
                     "status": "success", 
                     "message": "PDF successfully processed into chunks", 
-                    "chunks": len(chunks)
+                    "chunks": len(chapter['chunks'])
                 })
             except Exception as e:
                 app.logger.error(f"Error processing PDF: {str(e)}")
                 return jsonify({"error": f"Failed to process PDF: {str(e)}"}), 500
         else:
+            add_to_corpus_index(file_path, chapter)
             return jsonify({
                 "status": "success", 
                 "message": "Using cached PDF chunks", 
-                "chunks": len(chunks)
+                "chunks": len(chapter['chunks'])
             })
 
     except Exception as e:
@@ -685,25 +620,86 @@ def ask():
         bucket_name = path.split('/')[2]
         file_path = "/".join(path.split('/')[3:])
 
-        chunks = load_chunks(bucket_name, file_path)
-        if chunks is None:
-            pdf_content = load_pdf_from_gcs(bucket_name, file_path)
-            chunks = split_pdf_into_chunks(pdf_content)
-            store_chunks(bucket_name, file_path, chunks)
+        chapter = load_chunks(bucket_name, file_path)
+        if chapter is None:
+            chapter = ingest_pdf(bucket_name, file_path)
 
-        relevant_chunks = retrieve_relevant_chunks(chunks, question)
+        relevant_chunks = retrieve_relevant_chunks_with_scores(chapter, question, top_k=CONTEXT_CANDIDATES)
         if not relevant_chunks:
             return jsonify({"answer": "I couldn't find relevant information to answer your question."})
 
-        context = " ".join(chunk.replace("\n", " ") for chunk in relevant_chunks).strip()
-        answer = generate_answer(context, question)
+        context, context_stats = pack_context(relevant_chunks, context_budget('ask'), question)
+        answer, _ = generate_answer_cached(chapter_scope(chapter), context, question)
 
-        return jsonify({"answer": answer})
+        return jsonify({
+            "answer": answer,
+            "debug": {
+                "prompt_tokens": count_tokens(build_answer_prompt(context, question)),
+                "context_tokens": context_stats['context_tokens'],
+                "context_budget": context_stats['budget']
+            }
+        })
+    except LLMUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error answering question: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def load_quiz_chunks(board, class_level, subject, chapter_number):
+    """Chunks for a quiz chapter, reusing the local chunk cache before touching GCS"""
+    bucket_name = "rag-project-storagebucket"
+    # Matches Chapter_1.pdf, chapter (1).pdf, chapter_1.pdf, Chapter 1.pdf, ...
+    file_path = resolve_object_name(bucket_name, f"{board}/Class {class_level}/{subject}/chapter {chapter_number}.pdf")
+
+    chapter = load_chunks(bucket_name, file_path)
+    if not chapter or not chapter['chunks']:
+        chapter = ingest_pdf(bucket_name, file_path)
+    return chapter['chunks']
+
+# Sampled per round; the quiz token budget decides how much of them reaches Gemini
+QUIZ_CONTEXT_CHUNKS = 16
+
+def generate_quiz_questions(board, class_level, subject, chapter, difficulty):
+    """One Gemini round of validated multiple choice questions for a chapter"""
+    # Extract chapter number to locate the chapter PDF
+    chapter_number = re.search(r'\d+', chapter).group() if re.search(r'\d+', chapter) else '1'
+    chunks = load_quiz_chunks(board, class_level, subject, chapter_number)
+
+    # A different slice of the chapter each round keeps the question pool varied
+    picked = sorted(random.sample(range(len(chunks)), min(QUIZ_CONTEXT_CHUNKS, len(chunks))))
+    context, context_stats = pack_context([(chunks[i], 0.0) for i in picked], context_budget('quiz'))
+
+    # Generate quiz
+    model = get_generative_model("gemini-2.0-flash-001")
+    prompt = (
+        f"Generate 10 multiple choice questions based on the following educational content. "
+        f"Difficulty level: {difficulty}. "
+        f"Each question should be clear and complete. For each question, provide:\n"
+        f"- A complete question text\n"
+        f"- 4 possible options (labeled a, b, c, d)\n"
+        f"- The correct answer (0-3 corresponding to options)\n"
+        f"- A complete and detailed explanation\n"
+        f"- The topic from the content\n"
+        f"Format the response as a JSON array with these fields: question, options, correctAnswer, explanation, topic.\n"
+        f"Content:\n{context}\n\nQuestions:"
+    )
+
+    app.logger.info(f"Quiz prompt for {board} class {class_level} {subject} {chapter}: "
+                    f"{count_tokens(prompt)} tokens ({context_stats['context_tokens']} context)")
+    response = llm_gate.call(model.generate_content, prompt)
+    questions = json.loads(response.text)
+
+    # Validate output
+    validated_questions = []
+    for q in questions[:10]:
+        if all(k in q for k in ['question', 'options', 'correctAnswer', 'explanation', 'topic']) \
+           and len(q['options']) == 4 and 0 <= q['correctAnswer'] <= 3:
+            validated_questions.append(q)
+    return validated_questions
+
+quiz_bank = QuizBank(generate_quiz_questions, logger=app.logger)
+
 @app.route('/generate-quiz', methods=['POST'])
 @login_required
 def generate_quiz():
@@ -716,75 +712,16 @@ def generate_quiz():
         if not subject or not chapter:
             return jsonify({"error": "Missing subject or chapter"}), 400
 
-        user = auth.get_user_by_email(session.get('user'))
-        user_ref = db.collection('users').document(user.uid)
-        user_data = user_ref.get().to_dict()
+        user_data = get_user_profile() or {}
         
-        board = user_data.get('board', 'NCERT')  # Default to NCERT
-        class_level = user_data.get('class', '8')  # Default to class 8
-
-        # Extract chapter number and construct full GCS path
-        chapter_number = re.search(r'\d+', chapter).group() if re.search(r'\d+', chapter) else '1'
-        gcs_path = f"gs://rag-project-storagebucket/{board}/Class {class_level}/{subject}/Chapter_{chapter_number}.pdf"
-
-        # Split bucket and file path
-        bucket_name = "rag-project-storagebucket"
-        file_path = gcs_path.replace("gs://rag-project-storagebucket/", "")
-
-        app.logger.debug(f"PDF path: {gcs_path}")
+        board = user_data.get('board') or 'NCERT'  # Default to NCERT
+        class_level = user_data.get('class') or '8'  # Default to class 8
 
+        # Served from the pre-generated pool; refilled in the background when low
         try:
-            pdf_content = load_pdf_from_gcs(bucket_name, file_path)
-        except FileNotFoundError:
-            # Try alternative path patterns if the first attempt fails
-            alternative_paths = [
-                f"{board}/Class {class_level}/{subject}/chapter ({chapter_number}).pdf",
-                f"{board}/Class {class_level}/{subject}/chapter_{chapter_number}.pdf",
-                f"{board}/Class {class_level}/{subject}/Chapter {chapter_number}.pdf"
-            ]
-            
-            pdf_content = None
-            for path in alternative_paths:
-                try:
-                    pdf_content = load_pdf_from_gcs(bucket_name, path)
-                    break
-                except FileNotFoundError:
-                    continue
-            
-            if not pdf_content:
-                return jsonify({"error": "PDF not found (tried multiple path variations)"}), 404
-
-        # Rest of your existing code...
-
-        # Process PDF
-        chunks = split_pdf_into_chunks(pdf_content)
-        store_chunks(bucket_name, file_path, chunks)
-        context = " ".join(retrieve_relevant_chunks(chunks, "generate quiz question", top_k=10))
-
-        # Generate quiz
-        model = GenerativeModel("gemini-2.0-flash-001")
-        prompt = (
-            f"Generate 10 multiple choice questions based on the following educational content. "
-            f"Difficulty level: {difficulty}. "
-            f"Each question should be clear and complete. For each question, provide:\n"
-            f"- A complete question text\n"
-            f"- 4 possible options (labeled a, b, c, d)\n"
-            f"- The correct answer (0-3 corresponding to options)\n"
-            f"- A complete and detailed explanation\n"
-            f"- The topic from the content\n"
-            f"Format the response as a JSON array with these fields: question, options, correctAnswer, explanation, topic.\n"
-            f"Content:\n{context}\n\nQuestions:"
-        )
-
-        response = model.generate_content(prompt)
-        questions = json.loads(response.text)
-
-        # Validate output
-        validated_questions = []
-        for q in questions[:10]:
-            if all(k in q for k in ['question', 'options', 'correctAnswer', 'explanation', 'topic']) \
-               and len(q['options']) == 4 and 0 <= q['correctAnswer'] <= 3:
-                validated_questions.append(q)
+            validated_questions = quiz_bank.sample(board, class_level, subject, chapter, difficulty)
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 404
 
         if not validated_questions:
             return jsonify({"error": "No valid questions generated"}), 500
@@ -796,6 +733,8 @@ def generate_quiz():
             "generatedAt": datetime.now().isoformat()
         })
 
+    except LLMUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error generating quiz: {str(e)}")
         traceback.print_exc()
@@ -809,16 +748,17 @@ def api_forgot_password():
         if not email:
             return jsonify({'error': "Email is required"}), 400
             
+        ensure_firebase()
         try:
             user = auth.get_user_by_email(email)
-        except firebase_admin.auth.UserNotFoundError:
+        except auth.UserNotFoundError:
             return jsonify({'error': "Email not found"}), 404
 
         try:
             link = auth.generate_password_reset_link(email)
             msg = Message('Reset Your Password', recipients=[email])
             msg.body = f"Click the link to reset your password:\n\n{link}\n\nIf you didn't request this, ignore this email."
-            mail.send(msg)
+            mail_queue.send(msg)
             return jsonify({"message": "Password reset email sent"})
         except Exception as e:
             app.logger.error(f"Error sending password reset email: {str(e)}")
@@ -827,52 +767,28 @@ def api_forgot_password():
         app.logger.error(f"Forgot password error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-# Add this function to your helper functions
-# def get_pdf_from_storage(bucket_name, file_path):
-#     """Retrieve PDF from Google Cloud Storage with your structure"""
-#     try:
-#         storage_client = storage.Client()
-#         bucket = storage_client.bucket(bucket_name)
-        
-#         # Handle the space in folder names (like "Class 10")
-#         blob = bucket.blob(file_path)
-        
-#         if not blob.exists():
-#             # Try alternative path formats if needed
-#             alt_path = file_path.replace("Class ", "class ")
-#             blob = bucket.blob(alt_path)
-#             if not blob.exists():
-#                 raise FileNotFoundError(f"File not found at gs://{bucket_name}/{file_path}")
-                
-#         return blob.download_as_bytes()
-#     except Exception as e:
-#         app.logger.error(f"Error loading PDF from GCS: {str(e)}")
-#         raise
+@app.route('/api/startup-report')
+@login_required
+def get_startup_report():
+    return jsonify(startup_report())
 
-def get_pdf_from_storage(bucket_name, file_path):
-    """Retrieve PDF from Google Cloud Storage with flexible naming"""
-    try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        
-        # Try multiple filename patterns
-        patterns_to_try = [
-            file_path,  # Original path
-            # file_path.replace("chapter (", "chapter_").replace(")", ""),  # chapter (1).pdf → chapter_1.pdf
-            file_path.replace("chapter (", "Chapter ").replace(").pdf", ".pdf"),  # Chapter 1.pdf
-            file_path.replace("Chapter_", "chapter "),  # chapter_1.pdf → chapter 1.pdf
-            file_path.replace("chapter ", "Chapter "),  # chapter 1.pdf → Chapter 1.pdf
-        ]
-        
-        for pattern in patterns_to_try:
-            blob = bucket.blob(pattern)
-            if blob.exists():
-                return blob.download_as_bytes()
-        
-        raise FileNotFoundError(f"PDF not found (tried: {', '.join(patterns_to_try)}")
-    except Exception as e:
-        app.logger.error(f"Error loading PDF from GCS: {str(e)}")
-        raise
+@app.route('/api/metrics')
+@login_required
+def get_metrics():
+    return jsonify({
+        'query_embedding_cache': query_cache_stats(),
+        'answer_cache': answer_cache.stats(),
+        'pdf_cache': pdf_cache_stats(),
+        'chapter_cache': chunk_store.cache.stats(),
+        'profile_cache': profile_cache.stats(),
+        'score_writer': score_writer.stats(),
+        'mail_queue': mail_queue.stats(),
+        'singleflight': singleflight_stats(),
+        'llm_gate': llm_gate.stats()
+    })
+
+mark_ready()
+app.logger.info(f"App ready in {startup_report()['ready_seconds']}s")
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
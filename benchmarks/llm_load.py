@@ -0,0 +1,168 @@
+"""Load-test /api/chat/ask at a fixed worker count, per serving mode.
+
+    python benchmarks/llm_load.py gs://rag-project-storagebucket/NCERT/Class\\ 10/Maths/Chapter_1.pdf \\
+        --modes sync gevent --workers 2 --requests 200 --concurrency 50 --fake-llm-latency 1.5
+
+For every mode a gunicorn server is started from the repo root with
+SERVING_MODE set and the given number of workers, the chapter is ingested,
+the workers are warmed up, and then --requests questions are sent from
+--concurrency client threads. Every question is different and the answer
+cache is disabled, so each request reaches the model.
+
+--fake-llm-latency replaces Gemini with a model that waits that many seconds
+before answering, which measures the serving model without Gemini quota or
+latency noise. Without it the real Gemini model is called. --url sends the
+load to an already running server instead (one mode, started by you).
+SECRET_KEY must match the server's, it signs the session cookie.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+QUESTION = "Explain the main idea of this chapter with an example"
+
+class FakeGemini:
+    """Stand-in for the Gemini model handle that only waits"""
+
+    class Response:
+        text = "Simulated answer."
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, stream=False):
+        # Patched by gevent in the gevent worker, like a wait on Gemini's socket
+        time.sleep(self.latency)
+        return iter([self.Response()]) if stream else self.Response()
+
+def fake_llm_app():
+    """gunicorn app factory: the real app with Gemini replaced by FakeGemini"""
+    import clients
+    from app import app
+    clients._clients['gemini:gemini-2.0-flash-001'] = FakeGemini(float(os.environ['BENCH_FAKE_LLM_LATENCY']))
+    return app
+
+def session_cookie(secret_key, user):
+    """Signed Flask session cookie for a logged-in user"""
+    from flask import Flask
+    signer = Flask(__name__)
+    signer.secret_key = secret_key
+    return signer.session_interface.get_signing_serializer(signer).dumps({'user': user})
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(mode, workers, fake_latency):
+    port = free_port()
+    env = dict(os.environ, SERVING_MODE=mode, ANSWER_CACHE_THRESHOLD='2')
+    app_spec = 'app:app'
+    if fake_latency is not None:
+        env['BENCH_FAKE_LLM_LATENCY'] = str(fake_latency)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+        app_spec = 'benchmarks.llm_load:fake_llm_app()'
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', app_spec],
+        cwd=ROOT, env=env
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            # Any answer, even the 401 for a missing session, means gunicorn is serving
+            requests.get(f'{url}/api/startup-report', timeout=1)
+            return server, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start within 120s")
+
+def ask(url, cookie, path, question):
+    started = time.perf_counter()
+    try:
+        response = requests.post(f'{url}/api/chat/ask', json={'path': path, 'question': question},
+                                 cookies={'session': cookie}, timeout=300)
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    return ok, time.perf_counter() - started
+
+def run_load(url, cookie, path, total, concurrency, workers):
+    submitted = requests.post(f'{url}/api/chat/submit-path', json={'path': path},
+                              cookies={'session': cookie}, timeout=600)
+    submitted.raise_for_status()
+
+    # Every worker loads the embedding model on its first question
+    with ThreadPoolExecutor(workers * 2) as pool:
+        list(pool.map(lambda i: ask(url, cookie, path, f"{QUESTION} (warm-up {i})"), range(workers * 2)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda i: ask(url, cookie, path, f"{QUESTION} (#{i})"), range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for ok, seconds in results if ok)
+    errors = total - len(latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float('nan')
+
+    return {
+        'requests_per_second': len(latencies) / elapsed,
+        'errors': errors,
+        'seconds': elapsed,
+        'p50': percentile(0.5),
+        'p95': percentile(0.95)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='gs:// path of a chapter PDF')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gevent'], choices=['sync', 'gevent'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--fake-llm-latency', type=float)
+    parser.add_argument('--url', help='load an already running server instead of starting one per mode')
+    parser.add_argument('--user', default='loadtest@example.com')
+    args = parser.parse_args(argv)
+
+    secret_key = os.getenv('SECRET_KEY')
+    if not secret_key:
+        print("SECRET_KEY must be set to the server's secret key")
+        return 1
+    cookie = session_cookie(secret_key, args.user)
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, {args.workers} workers")
+    print(f"{'mode':<8} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'errors':>7}")
+    for mode in ([None] if args.url else args.modes):
+        server = None
+        url = args.url
+        if url is None:
+            server, url = start_server(mode, args.workers, args.fake_llm_latency)
+        try:
+            result = run_load(url, cookie, args.path, args.requests, args.concurrency, args.workers)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        print(f"{mode or 'server':<8} {result['requests_per_second']:>8.2f} {result['p50']:>8.2f} "
+              f"{result['p95']:>8.2f} {result['errors']:>7}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Compare serial and parallel PDF page extraction.
+
+    python benchmarks/pdf_extraction.py chapter.pdf [more.pdf ...] --workers 4 --repeat 3
+
+"serial (chat.py, old)" is the previous chat.py path that called extract_text()
+twice per page, "serial" walks the pages once, "parallel" is
+pdf_extract.extract_pages with the page threshold forced to zero.
+"""
+import os
+import io
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2
+import pdf_extract
+
+def serial_double(pdf_bytes):
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [page.extract_text() for page in reader.pages if page.extract_text()]
+
+def serial(pdf_bytes):
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [page.extract_text() or '' for page in reader.pages]
+
+def parallel(pdf_bytes):
+    return pdf_extract.extract_pages(pdf_bytes)
+
+def best_of(fn, pdf_bytes, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(pdf_bytes)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--workers', type=int, default=pdf_extract.PDF_EXTRACT_WORKERS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    pdf_extract.PDF_EXTRACT_WORKERS = args.workers
+    pdf_extract.PARALLEL_PAGE_THRESHOLD = 0
+    # Start the worker processes up front so the first run is not charged for spawning them
+    pdf_extract._get_executor().submit(len, b'').result()
+
+    for path in args.pdfs:
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+        pages = len(PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+        if serial(pdf_bytes) != parallel(pdf_bytes):
+            print(f"{path}: parallel output differs from serial output")
+            return 1
+
+        print(f"{os.path.basename(path)} ({pages} pages, best of {args.repeat})")
+        baseline = None
+        for name, fn in [('serial (chat.py, old)', serial_double), ('serial', serial),
+                         (f"parallel x{args.workers}", parallel)]:
+            seconds = best_of(fn, pdf_bytes, args.repeat)
+            baseline = baseline or seconds
+            print(f"  {name:<24} {seconds * 1000:8.1f} ms  {pages / seconds:7.1f} pages/s  {baseline / seconds:5.2f}x")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import base64
+import hashlib
+import shutil
+import threading
+from clients import get_storage_client, GCS_TIMEOUT
+
+# ===== Bucket Manifest =====
+# The bucket prefix is listed once (and re-listed periodically) into an
+# in-memory table keyed by a normalized object name, so resolving a chapter
+# path is a dictionary lookup instead of a chain of blob.exists() calls.
+MANIFEST_TTL = int(os.getenv('BUCKET_MANIFEST_TTL', '300'))
+MANIFEST_PREFIX = os.getenv('BUCKET_MANIFEST_PREFIX', '')
+# A lookup miss may trigger an early re-list, but at most this often
+MANIFEST_MISS_REFRESH_INTERVAL = int(os.getenv('BUCKET_MANIFEST_MISS_REFRESH', '30'))
+# Directory that stands in for GCS (one sub-directory per bucket), e.g. for tests
+LOCAL_BUCKET_DIR = os.getenv('LOCAL_BUCKET_DIR')
+
+def normalize_segment(segment):
+    """'Chapter_1', 'chapter (1)', 'Chapter 1.pdf' -> 'chapter1'; 'Class 10', 'class_10' -> 'class10'"""
+    segment = segment.lower()
+    if segment.endswith('.pdf'):
+        segment = segment[:-4]
+    return re.sub(r'[\s_()\-]+', '', segment)
+
+def normalize_object_name(name):
+    return '/'.join(normalize_segment(part) for part in name.strip('/').split('/') if part)
+
+class LocalBlob:
+    """Minimal stand-in for google.cloud.storage.Blob backed by a local file"""
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.root, *name.split('/'))
+        self._stat = None
+
+    def _ensure_stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    @property
+    def size(self):
+        return self._ensure_stat().st_size
+
+    @property
+    def generation(self):
+        return self._ensure_stat().st_mtime_ns
+
+    @property
+    def md5_hash(self):
+        return self.bucket.md5_of(self.path)
+
+    def exists(self, timeout=None):
+        return os.path.isfile(self.path)
+
+    def reload(self, timeout=None):
+        self._stat = None
+        self._ensure_stat()
+
+    def download_as_bytes(self, timeout=None):
+        if not self.exists():
+            raise FileNotFoundError(f"File not found at {self.path}")
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def download_to_filename(self, filename, timeout=None):
+        if not self.exists():
+            raise FileNotFoundError(f"File not found at {self.path}")
+        shutil.copyfile(self.path, filename)
+
+class LocalBucket:
+    """Directory-backed stand-in for google.cloud.storage.Bucket"""
+
+    def __init__(self, root, name=None):
+        self.root = root
+        self.name = name or os.path.basename(os.path.normpath(root))
+        self._md5_cache = {}
+
+    def md5_of(self, path):
+        """Base64 MD5 like GCS reports it, cached until the file changes"""
+        stat = os.stat(path)
+        cached = self._md5_cache.get(path)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+
+        digest = hashlib.md5()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        md5_hash = base64.b64encode(digest.digest()).decode()
+        self._md5_cache[path] = ((stat.st_mtime_ns, stat.st_size), md5_hash)
+        return md5_hash
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def list_blobs(self, prefix='', timeout=None):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                relative = os.path.relpath(os.path.join(dirpath, filename), self.root)
+                name = relative.replace(os.sep, '/')
+                if name.startswith(prefix):
+                    yield LocalBlob(self, name)
+
+def get_bucket(bucket_name):
+    """The bucket handle, or its local directory stand-in when LOCAL_BUCKET_DIR is set"""
+    if LOCAL_BUCKET_DIR:
+        return LocalBucket(os.path.join(LOCAL_BUCKET_DIR, bucket_name), bucket_name)
+    return get_storage_client().bucket(bucket_name)
+
+class BucketManifest:
+    """Periodically refreshed listing of a bucket prefix with normalized-name lookup"""
+
+    def __init__(self, bucket, prefix=MANIFEST_PREFIX, ttl=MANIFEST_TTL,
+                 miss_refresh_interval=MANIFEST_MISS_REFRESH_INTERVAL):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self.objects = {}      # exact name -> metadata
+        self.normalized = {}   # normalized name -> exact name
+        self.refreshed_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self):
+        """List the prefix once and rebuild both lookup tables"""
+        objects = {}
+        normalized = {}
+        for blob in self.bucket.list_blobs(prefix=self.prefix, timeout=GCS_TIMEOUT):
+            if blob.name.endswith('/'):
+                continue
+            objects[blob.name] = {
+                'name': blob.name,
+                'size': blob.size,
+                'md5_hash': blob.md5_hash,
+                'generation': blob.generation
+            }
+            normalized.setdefault(normalize_object_name(blob.name), blob.name)
+
+        with self._lock:
+            self.objects = objects
+            self.normalized = normalized
+            self.refreshed_at = time.time()
+
+    def _is_older_than(self, max_age):
+        return self.refreshed_at is None or time.time() - self.refreshed_at > max_age
+
+    def _refresh_if_older_than(self, max_age):
+        if not self._is_older_than(max_age):
+            return False
+        # Only one thread re-lists; the others wait and reuse its result
+        with self._refresh_lock:
+            if self._is_older_than(max_age):
+                self.refresh()
+        return True
+
+    def _lookup(self, file_path):
+        if file_path in self.objects:
+            return file_path
+        return self.normalized.get(normalize_object_name(file_path))
+
+    def resolve(self, file_path):
+        """Actual object name for any spelling of a path, or None"""
+        self._refresh_if_older_than(self.ttl)
+        name = self._lookup(file_path)
+        # The object may have been uploaded since the last listing
+        if name is None and self._refresh_if_older_than(self.miss_refresh_interval):
+            name = self._lookup(file_path)
+        return name
+
+    def info(self, name):
+        """Listing metadata (size, md5_hash, generation) for an exact object name"""
+        return self.objects.get(name)
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+def get_manifest(bucket_name):
+    with _manifests_lock:
+        manifest = _manifests.get(bucket_name)
+        if manifest is None:
+            manifest = BucketManifest(get_bucket(bucket_name))
+            _manifests[bucket_name] = manifest
+    return manifest
+
+def resolve_object_name(bucket_name, file_path):
+    """Resolve a requested PDF path to the real object name, or raise FileNotFoundError"""
+    name = get_manifest(bucket_name).resolve(file_path)
+    if name is None:
+        raise FileNotFoundError(f"PDF not found at gs://{bucket_name}/{file_path}")
+    return name
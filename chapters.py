@@ -0,0 +1,46 @@
+from bucket_manifest import resolve_object_name
+from pdf_cache import fetch_pdf_path
+from pdf_pipeline import stream_pdf_to_store
+from chunk_store import chunk_store, chapter_key
+from singleflight import ingest_flight
+from ann_index import is_indexed, index_chapter
+from retrieval import retrieve
+
+# ===== Chapter Access =====
+# Ingestion, corpus indexing and retrieval of one chapter, shared by app.py's
+# routes and the chat blueprint.
+
+def ingest_pdf(bucket_name, file_path):
+    """Stream a chapter PDF into the chunk store and return the stored chapter"""
+    try:
+        object_name = resolve_object_name(bucket_name, file_path)
+        key = chapter_key(bucket_name, object_name)
+
+        def ingest():
+            # Pages are read from the cached file on disk, never as one bytes object
+            stream_pdf_to_store(fetch_pdf_path(bucket_name, object_name), key)
+            return chunk_store.load(key)
+
+        # Concurrent requests for the same chapter share one download and ingestion
+        chapter, _ = ingest_flight.do(key, ingest, recheck=lambda: chunk_store.load(key))
+        return chapter
+    except Exception as e:
+        print(f"Error ingesting PDF: {str(e)}")
+        raise
+
+def add_to_corpus_index(object_name, chapter):
+    """Make a chapter searchable through its class/subject corpus index"""
+    try:
+        # A re-ingested chapter has a new generation and replaces its old rows
+        if not is_indexed(object_name, chapter['generation']):
+            index_chapter(object_name, chapter['chunks'], chapter['embeddings'], chapter['generation'])
+    except Exception as e:
+        print(f"Error indexing chunks: {str(e)}")
+
+def retrieve_relevant_chunks_with_scores(chapter, query, top_k=3):
+    """Retrieve a chapter's most relevant chunks with their scores (dense, BM25 or both, see retrieval.py)"""
+    try:
+        return retrieve(chapter, query, top_k)
+    except Exception as e:
+        print(f"Error retrieving chunks: {str(e)}")
+        return []
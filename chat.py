@@ -1,19 +1,19 @@
 import os
-import io
 import json
 import traceback
-from flask import Blueprint, request, jsonify, render_template, session
-from PyPDF2 import PdfReader
-from google.cloud import storage
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
-import firebase_admin
-from firebase_admin import credentials, auth
-import requests
+from flask import Blueprint, Response, request, jsonify, render_template, session, stream_with_context
 from functools import wraps
 from dotenv import load_dotenv
+from answer_cache import answer_cache
+from bucket_manifest import resolve_object_name
+from chunk_store import chapter_key, load_chapter
+from ann_index import search_partition, partition_key, partition_version
+from embeddings import encode_query
+from context_packer import pack_context, context_budget, count_tokens, CONTEXT_CANDIDATES
+from llm_gate import LLMUnavailable
+from retrieval import cache_embedding
+from answers import ANSWER_ERROR, answer_cache_scope, build_answer_prompt, chapter_scope, generate_answer_stream, generate_answer_cached
+from chapters import ingest_pdf, add_to_corpus_index, retrieve_relevant_chunks_with_scores
 
 # Load environment variables
 load_dotenv()
@@ -21,17 +21,6 @@ load_dotenv()
 # Create Blueprint
 chat_bp = Blueprint('chat', __name__, template_folder='templates')
 
-# Initialize Firebase (only if not already initialized)
-if not firebase_admin._apps:
-    try:
-        firebase_cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH'))
-        firebase_admin.initialize_app(firebase_cred)
-    except Exception as e:
-        print(f"Firebase initialization error: {str(e)}")
-
-# Initialize models
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
 # Authentication Decorator
 def chat_login_required(f):
     @wraps(f)
@@ -62,32 +51,30 @@ def submit_path():
         if not gcs_path:
             return jsonify({"error": "Missing GCS path"}), 400
 
-        # Generate chunks path
-        chunks_path = get_chunks_path(gcs_path)
-        print(f"Looking for chunks file: {chunks_path}")
+        # Resolve the chapter against the bucket manifest (any spelling of the path)
+        bucket_name, object_name, file_path = resolve_chapter(gcs_path)
+        key = chapter_key(bucket_name, object_name)
+        print(f"Looking for chapter in chunk store: {key}")
 
-        # Check if chunks exist locally
-        if os.path.exists(chunks_path):
+        # Check if the chapter was already ingested (by either blueprint)
+        chapter = load_chapter(bucket_name, object_name, requested_path=file_path)
+        if chapter is not None:
+            add_to_corpus_index(object_name, chapter)
             return jsonify({
                 "status": "success", 
                 "message": "Using cached chunks",
-                "chunks_path": os.path.abspath(chunks_path)
+                "chapter": key
             })
 
-        # If not, process the PDF
-        bucket_name = gcs_path.split('/')[2]
-        file_path = '/'.join(gcs_path.split('/')[3:])
-        
-        # Try to load PDF with multiple path variations
-        pdf_content = load_pdf_from_gcs(bucket_name, file_path)
-        chunks = split_pdf_into_chunks(pdf_content)
-        store_chunks_locally(chunks_path, chunks)
+        # If not, process the PDF; students opening the same chapter at once share one ingestion
+        chapter = ingest_pdf(bucket_name, object_name)
+        add_to_corpus_index(object_name, chapter)
 
         return jsonify({
             "status": "success",
             "message": "PDF processed and chunks saved",
-            "chunks_path": os.path.abspath(chunks_path),
-            "chunk_count": len(chunks)
+            "chapter": key,
+            "chunk_count": len(chapter['chunks'])
         })
 
     except FileNotFoundError as e:
@@ -112,174 +99,233 @@ def ask():
         if not gcs_path or not question:
             return jsonify({"error": "Missing path or question"}), 400
 
-        chunks_path = get_chunks_path(gcs_path)
+        chapter = get_chapter(gcs_path)
         
-        if not os.path.exists(chunks_path):
+        if chapter is None:
             return jsonify({
                 "error": "Chunks not found",
                 "solution": "Submit the PDF path first using /api/chat/submit-path"
             }), 404
 
-        with open(chunks_path, 'r') as f:
-            chunks = json.load(f)
+        context, debug_chunks, context_stats = build_chat_context(chapter, question)
+        
+        if not context:
+            return jsonify({
+                "error": "No relevant context found",
+                "debug": {
+                    "question": question,
+                    "top_chunks": debug_chunks
+                }
+            }), 404
 
-        # Get relevant chunks with scores for debugging
-        relevant_chunks_with_scores = retrieve_relevant_chunks_with_scores(chunks, question)
+        answer, from_cache = generate_answer_cached(chapter_scope(chapter), context, question, markdown=False)
         
-        # Convert float32 to native Python float for JSON serialization
+        return jsonify({
+            "answer": answer,
+            "debug": {
+                "question": question,
+                "context_used": context[:500] + "..." if len(context) > 500 else context,
+                "top_chunks": debug_chunks,
+                "answer_cached": from_cache,
+                **prompt_debug(context, question, context_stats)
+            }
+        })
+
+    except LLMUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@chat_bp.route('/api/chat/ask-stream', methods=['POST'])
+@chat_login_required
+def ask_stream():
+    """Same as /api/chat/ask, but streams the answer as Server-Sent Events"""
+    try:
+        data = request.get_json()
+        gcs_path = data.get("path")
+        question = data.get("question")
+
+        if not gcs_path or not question:
+            return jsonify({"error": "Missing path or question"}), 400
+
+        chapter = get_chapter(gcs_path)
+        
+        if chapter is None:
+            return jsonify({
+                "error": "Chunks not found",
+                "solution": "Submit the PDF path first using /api/chat/submit-path"
+            }), 404
+
+        context, debug_chunks, context_stats = build_chat_context(chapter, question)
+        
+        if not context:
+            return jsonify({
+                "error": "No relevant context found",
+                "debug": {
+                    "question": question,
+                    "top_chunks": debug_chunks
+                }
+            }), 404
+
+        query_embedding = cache_embedding(question)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+    def events():
+        # Retrieval debug info goes first so the UI can show it while Gemini is still thinking
+        yield sse_event("debug", {
+            "question": question,
+            "context_used": context[:500] + "..." if len(context) > 500 else context,
+            "top_chunks": debug_chunks,
+            **prompt_debug(context, question, context_stats)
+        })
+
+        scope = answer_cache_scope(chapter_scope(chapter), markdown=False)
+        cached = answer_cache.lookup(scope, question, query_embedding)
+        if cached is not None:
+            yield sse_event("token", {"text": cached})
+            yield sse_event("done", {"answer_cached": True})
+            return
+
+        pieces = []
+        try:
+            for text in generate_answer_stream(context, question, markdown=False):
+                pieces.append(text)
+                yield sse_event("token", {"text": text})
+        except LLMUnavailable as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+        except Exception:
+            traceback.print_exc()
+            yield sse_event("error", {"error": ANSWER_ERROR})
+            return
+
+        answer = "".join(pieces).strip()
+        if answer:
+            answer_cache.store(scope, question, query_embedding, answer)
+        yield sse_event("done", {"answer_cached": False})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@chat_bp.route('/api/chat/ask-subject', methods=['POST'])
+@chat_login_required
+def ask_subject():
+    """Answer from every ingested chapter of a board/class/subject, no chapter pick needed"""
+    try:
+        data = request.get_json()
+        board = data.get("board")
+        class_level = data.get("class")
+        subject = data.get("subject")
+        question = data.get("question")
+
+        if not all([board, class_level, subject, question]):
+            return jsonify({"error": "Missing board, class, subject or question"}), 400
+
+        query_embedding = encode_query(question)
+        results = search_partition(board, class_level, subject, query_embedding, top_k=CONTEXT_CANDIDATES)
+
         debug_chunks = []
-        for chunk, score in relevant_chunks_with_scores:
+        for entry, score in results:
+            chunk = entry['text']
             debug_chunks.append({
                 "text": chunk[:200] + "..." if len(chunk) > 200 else chunk,
-                "score": float(score)  # Convert numpy float32 to Python float
+                "score": score,
+                "source": entry['source']
             })
-        
-        context = " ".join(chunk.replace("\n", " ") for chunk, _ in relevant_chunks_with_scores).strip()
-        
+
+        context, context_stats = pack_context(
+            [(entry['text'], score) for entry, score in results], context_budget('subject'), question
+        )
+
         if not context:
             return jsonify({
                 "error": "No relevant context found",
+                "solution": "Submit at least one chapter of this subject first using /api/chat/submit-path",
                 "debug": {
                     "question": question,
                     "top_chunks": debug_chunks
                 }
             }), 404
 
-        answer = generate_answer(context, question)
-        
+        # The partition version changes whenever a chapter of the subject is (re)indexed
+        scope = f"subject:{partition_key(board, class_level, subject)}#{partition_version(board, class_level, subject)}"
+        answer, from_cache = generate_answer_cached(scope, context, question, markdown=False)
+
         return jsonify({
             "answer": answer,
             "debug": {
                 "question": question,
                 "context_used": context[:500] + "..." if len(context) > 500 else context,
-                "top_chunks": debug_chunks
+                "top_chunks": debug_chunks,
+                "answer_cached": from_cache,
+                **prompt_debug(context, question, context_stats)
             }
         })
 
+    except LLMUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-def retrieve_relevant_chunks_with_scores(chunks, query, top_k=3):
-    """Find most relevant chunks with their similarity scores"""
-    query_embedding = embedding_model.encode([query])[0]
-    scored_chunks = []
-    
-    for chunk in chunks:
-        chunk_embedding = embedding_model.encode([chunk])[0]
-        score = np.dot(query_embedding, chunk_embedding)  # Using dot product for similarity
-        scored_chunks.append((chunk, score))
-    
-    # Sort by score descending
-    scored_chunks.sort(reverse=True, key=lambda x: x[1])
-    return scored_chunks[:top_k]
-
 # Helper Functions
-def get_chunks_path(gcs_path):
-    """Generate consistent local path for chunks JSON file."""
-    parts = gcs_path.split('/')
-    bucket_name = parts[2]
-    file_path = '/'.join(parts[3:])
-    return f"{bucket_name}_{file_path.replace('/', '_').replace(' ', '')}_chunks.json"
-
-def load_pdf_from_gcs(bucket_name, file_path):
-    """Load PDF from GCS with multiple path variations."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    
-    path_variations = [
-        file_path,
-        file_path + ".pdf",
-        file_path.replace(" ", "_"),
-        file_path.replace("Chapter ", "Chapter_"),
-        file_path.replace("Class ", "class_"),
-        file_path.lower(),
-        file_path.upper()
-    ]
+def build_chat_context(chapter, question):
+    """Retrieve the best chunks for a question and return (context, debug_chunks, context_stats)."""
+    # Get relevant chunks with scores for debugging
+    relevant_chunks_with_scores = retrieve_relevant_chunks_with_scores(chapter, question, top_k=CONTEXT_CANDIDATES)
     
-    for variant in path_variations:
-        blob = bucket.blob(variant)
-        if blob.exists():
-            return blob.download_as_bytes()
+    # Convert float32 to native Python float for JSON serialization
+    debug_chunks = []
+    for chunk, score in relevant_chunks_with_scores:
+        debug_chunks.append({
+            "text": chunk[:200] + "..." if len(chunk) > 200 else chunk,
+            "score": float(score)  # Convert numpy float32 to Python float
+        })
     
-    raise FileNotFoundError(
-        f"PDF not found at gs://{bucket_name}/{file_path}\n"
-        f"Tried variations: {path_variations}"
-    )
+    context, context_stats = pack_context(relevant_chunks_with_scores, context_budget('chat'), question)
+    return context, debug_chunks, context_stats
 
-def split_pdf_into_chunks(pdf_bytes):
-    """Convert PDF bytes to text chunks."""
-    pdf_stream = io.BytesIO(pdf_bytes)
-    reader = PdfReader(pdf_stream)
-    return [page.extract_text() for page in reader.pages if page.extract_text()]
+def prompt_debug(context, question, context_stats):
+    """Token accounting for the response debug block."""
+    return {
+        "prompt_tokens": count_tokens(build_answer_prompt(context, question, markdown=False)),
+        "context_tokens": context_stats['context_tokens'],
+        "context_budget": context_stats['budget'],
+        "duplicates_removed": context_stats['duplicates_removed']
+    }
 
-def store_chunks_locally(chunks_path, chunks):
-    """Save chunks to local JSON file."""
-    with open(chunks_path, 'w') as f:
-        json.dump(chunks, f)
+def sse_event(event, data):
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-def retrieve_relevant_chunks(chunks, query, top_k=3):
-    """Find most relevant chunks using semantic similarity with better scoring."""
-    try:
-        query_embedding = embedding_model.encode([query])[0]
-        scored_chunks = []
-        
-        for i, chunk in enumerate(chunks):
-            try:
-                chunk_embedding = embedding_model.encode([chunk])[0]
-                # Using cosine similarity
-                score = sum(q * c for q, c in zip(query_embedding, chunk_embedding))
-                scored_chunks.append((score, i, chunk))
-            except Exception as e:
-                print(f"Error encoding chunk {i}: {str(e)}")
-                continue
-        
-        # Sort by score descending
-        scored_chunks.sort(reverse=True, key=lambda x: x[0])
-        
-        # Return only chunks with positive scores
-        relevant = [chunk for score, i, chunk in scored_chunks[:top_k] if score > 0]
-        
-        if not relevant:
-            print("No relevant chunks found with positive similarity score")
-            # Fallback to returning first chunks if nothing matches
-            return chunks[:top_k]
-            
-        return relevant
-        
-    except Exception as e:
-        print(f"Error in retrieve_relevant_chunks: {str(e)}")
-        # Fallback to returning first chunks if error occurs
-        return chunks[:top_k]
-    
-def generate_answer(context, query, model_name="gemini-2.0-flash-001"):
-    """Generate answer using Gemini model with proper error handling"""
+def resolve_chapter(gcs_path):
+    """(bucket_name, object_name, requested_path) for a gs:// path, accepting any spelling known to the bucket manifest."""
+    parts = gcs_path.split('/')
+    bucket_name = parts[2]
+    file_path = '/'.join(parts[3:])
     try:
-        if not context or not query:
-            return "I couldn't find enough context to answer that question."
-            
-        model = GenerativeModel(model_name)
-        prompt = (
-            f"You are an expert educational assistant. Provide detailed, structured answers to student questions.\n\n"
-            f"Context:\n{context}\n\n"
-            f"Question: {query}\n\n"
-            f"Format your answer with:\n"
-            f"- Bold for key terms\n"
-            f"- Italics for emphasis\n"
-            f"- Lists for multiple items\n"
-            f"- Tables for comparative data\n"
-            f"- Headings for sections\n"
-            f"- Clear explanations with examples where needed\n\n"
-            f"Answer in detail, covering all relevant aspects from the context. "
-            f"If the question can't be answered from the context, say so explicitly.\n\n"
-            f"Answer:"
+        object_name = resolve_object_name(bucket_name, file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"PDF not found at gs://{bucket_name}/{file_path}\n"
+            f"No object in the bucket matches it (case, spaces, underscores and brackets ignored)"
         )
-        
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        app.logger.error(f"Error generating answer: {str(e)}")
-        return "I encountered an error while generating an answer. Please try again."
+    return bucket_name, object_name, file_path
+
+def get_chapter(gcs_path):
+    """Stored chunks of the chapter a gs:// path points to, or None if it was not ingested yet."""
+    try:
+        bucket_name, object_name, file_path = resolve_chapter(gcs_path)
+    except FileNotFoundError:
+        return None
+    return load_chapter(bucket_name, object_name, requested_path=file_path)
+
 # For standalone testing
 if __name__ == '__main__':
     from flask import Flask
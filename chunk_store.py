@@ -0,0 +1,412 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+import numpy as np
+from embeddings import get_embedding_model, encode_chunks
+from lexical_index import add_chunk, encode_postings, decode_postings
+
+# ===== Chunk Store =====
+# Every ingested chapter lives in one SQLite file: chunk text, page/offset
+# metadata and the float32 embedding of each chunk, keyed by
+# "<bucket>/<object name>" so app.py and the chat blueprint share a chapter no
+# matter how the path was spelled. Writers add rows under a fresh generation
+# number in short transactions and switch the chapter to it in one final
+# transaction, so readers see either the old chunk set or the complete new one,
+# never a half-written chapter. WAL mode lets readers in every worker run while
+# a chapter is being written, and SQLite's mmap I/O serves reads from the page
+# cache without a read() copy per page. Each generation also gets a BM25
+# inverted index (see lexical_index.py): a postings row per term and the term
+# count of every chunk, written in the same transaction that switches the
+# chapter to that generation.
+CHUNK_STORE_PATH = os.getenv('CHUNK_STORE_PATH', 'chunk_store.sqlite3')
+CHUNK_STORE_MMAP_BYTES = int(os.getenv('CHUNK_STORE_MMAP_BYTES', str(256 * 1024 ** 2)))
+# Rows of a writer that died mid-chapter are removed once they are this old
+ORPHAN_MAX_AGE = 24 * 3600
+# Where chunks were kept as JSON before the store existed
+LEGACY_CHUNKS_DIR = 'chunks'
+# Decoded chapters kept in memory per process (see ChapterCache)
+CHAPTER_CACHE_MAX_BYTES = int(os.getenv('CHAPTER_CACHE_MAX_BYTES', str(256 * 1024 ** 2)))
+
+def chapter_key(bucket_name, object_name):
+    return f"{bucket_name}/{object_name}"
+
+class ChapterWriter:
+    """Appends one chapter's chunks under a new generation; commit() makes them visible"""
+
+    def __init__(self, store, key, dim, chunker=None):
+        self.store = store
+        self.key = key
+        self.dim = dim
+        self.chunker = chunker
+        self.generation = time.time_ns()
+        self.count = 0
+        self._postings = {}  # term -> ([chunk index, ...], [term frequency, ...])
+        self._lengths = []
+
+    def append(self, chunks, embeddings):
+        """Add chunk dicts ({'text', 'page', 'start', 'end'}) with their embedding rows"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        rows = []
+        for offset, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+            rows.append((
+                self.key, self.generation, self.count + offset, chunk['text'],
+                chunk.get('page'), chunk.get('start'), chunk.get('end'), embedding.tobytes()
+            ))
+            add_chunk(self._postings, self._lengths, self.count + offset, chunk['text'])
+        with self.store._connect() as conn, conn:
+            conn.executemany(
+                "INSERT INTO chunks (chapter_key, generation, idx, text, page, start_offset, end_offset, embedding)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        self.count += len(rows)
+
+    def commit(self):
+        bucket_name, _, object_name = self.key.partition('/')
+        with self.store._connect() as conn, conn:
+            row = conn.execute("SELECT generation FROM chapters WHERE key = ?", (self.key,)).fetchone()
+            if row is not None and row[0] > self.generation:
+                # A newer write of the same chapter already landed; keep it
+                conn.execute("DELETE FROM chunks WHERE chapter_key = ? AND generation = ?",
+                             (self.key, self.generation))
+                return False
+
+            conn.execute(
+                "INSERT OR REPLACE INTO chapters"
+                " (key, bucket, object_name, generation, chunk_count, dim, chunker, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key, bucket_name, object_name, self.generation, self.count,
+                 self.dim, self.chunker, time.time())
+            )
+            self.store._write_lexical_index(conn, self.key, self.generation, self._postings, self._lengths)
+            for table in ('chunks', 'postings', 'chunk_lengths'):
+                conn.execute(f"DELETE FROM {table} WHERE chapter_key = ? AND generation < ?",
+                             (self.key, self.generation))
+        return True
+
+    def abort(self):
+        with self.store._connect() as conn, conn:
+            conn.execute("DELETE FROM chunks WHERE chapter_key = ? AND generation = ?",
+                         (self.key, self.generation))
+
+def _chapter_bytes(chapter):
+    """Approximate resident size of a decoded chapter"""
+    size = chapter['embeddings'].nbytes
+    if chapter.get('term_lengths') is not None:
+        size += chapter['term_lengths'].nbytes
+    size += sum(sys.getsizeof(chunk) for chunk in chapter['chunks'])
+    size += sum(sys.getsizeof(meta) for meta in chapter['metadata'])
+    return size
+
+class ChapterCache:
+    """Byte-bounded, thread-safe LRU of decoded chapters, valid for one store generation
+
+    Popular chapters are asked about many times a minute; serving them from
+    memory skips reading and decoding every chunk row per question. An entry
+    is only returned while its generation is still the chapter's current
+    one, so a re-ingest in any worker invalidates it on the next lookup.
+    """
+
+    def __init__(self, max_bytes=CHAPTER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (chapter, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]['generation'] != generation:
+                self._drop(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, chapter):
+        size = _chapter_bytes(chapter)
+        # A chapter bigger than the whole budget would only flush everything else
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if chapter['key'] in self._entries:
+                self._drop(chapter['key'])
+            self._entries[chapter['key']] = (chapter, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'chapters': len(self._entries),
+                'resident_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions
+            }
+
+class ChunkStore:
+    """SQLite-backed store of chapter chunks, metadata and embeddings"""
+
+    def __init__(self, path=CHUNK_STORE_PATH, cache_max_bytes=CHAPTER_CACHE_MAX_BYTES):
+        self.path = path
+        self.cache = ChapterCache(cache_max_bytes)
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute(f"PRAGMA mmap_size = {CHUNK_STORE_MMAP_BYTES}")
+        return closing(conn)
+
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            with self._connect() as conn, conn:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chapters ("
+                    " key TEXT PRIMARY KEY,"
+                    " bucket TEXT NOT NULL,"
+                    " object_name TEXT NOT NULL,"
+                    " generation INTEGER NOT NULL,"
+                    " chunk_count INTEGER NOT NULL,"
+                    " dim INTEGER NOT NULL,"
+                    " chunker INTEGER,"
+                    " updated_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chunks ("
+                    " chapter_key TEXT NOT NULL,"
+                    " generation INTEGER NOT NULL,"
+                    " idx INTEGER NOT NULL,"
+                    " text TEXT NOT NULL,"
+                    " page INTEGER,"
+                    " start_offset INTEGER,"
+                    " end_offset INTEGER,"
+                    " embedding BLOB NOT NULL,"
+                    " PRIMARY KEY (chapter_key, generation, idx)) WITHOUT ROWID"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS postings ("
+                    " chapter_key TEXT NOT NULL,"
+                    " generation INTEGER NOT NULL,"
+                    " term TEXT NOT NULL,"
+                    " postings BLOB NOT NULL,"
+                    " PRIMARY KEY (chapter_key, generation, term)) WITHOUT ROWID"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chunk_lengths ("
+                    " chapter_key TEXT NOT NULL,"
+                    " generation INTEGER NOT NULL,"
+                    " lengths BLOB NOT NULL,"
+                    " PRIMARY KEY (chapter_key, generation)) WITHOUT ROWID"
+                )
+                # Leftovers of writers that crashed before commit()
+                conn.execute(
+                    "DELETE FROM chunks WHERE generation < ? AND generation NOT IN"
+                    " (SELECT generation FROM chapters WHERE chapters.key = chunks.chapter_key)",
+                    (time.time_ns() - ORPHAN_MAX_AGE * 10 ** 9,)
+                )
+            self._initialized = True
+
+    def chapter_info(self, key):
+        """Generation, chunk count, dimension and chunker version of a stored chapter, or None"""
+        self._ensure_initialized()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT generation, chunk_count, dim, chunker, updated_at FROM chapters WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('generation', 'chunk_count', 'dim', 'chunker', 'updated_at'), row))
+
+    def load(self, key):
+        """{'key', 'chunks', 'metadata', 'embeddings', 'generation'} for a chapter, or None
+
+        Served from the in-process chapter cache while the chapter's
+        generation is unchanged. The result is shared between requests and
+        must not be modified.
+        """
+        self._ensure_initialized()
+        with self._connect() as conn:
+            row = conn.execute("SELECT generation FROM chapters WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.cache.invalidate(key)
+            return None
+
+        chapter = self.cache.get(key, row[0])
+        if chapter is None:
+            chapter = self._read(key)
+            if chapter is not None:
+                if chapter['term_lengths'] is None:
+                    self._backfill_lexical_index(chapter)
+                self.cache.put(chapter)
+        return chapter
+
+    def _read(self, key):
+        with self._connect() as conn:
+            # One read transaction: the chapter row and its chunks come from the same snapshot
+            conn.execute("BEGIN")
+            row = conn.execute("SELECT generation, dim FROM chapters WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            generation, dim = row
+            rows = conn.execute(
+                "SELECT text, page, start_offset, end_offset, embedding FROM chunks"
+                " WHERE chapter_key = ? AND generation = ? ORDER BY idx",
+                (key, generation)
+            ).fetchall()
+            lengths = conn.execute(
+                "SELECT lengths FROM chunk_lengths WHERE chapter_key = ? AND generation = ?", (key, generation)
+            ).fetchone()
+            conn.rollback()
+
+        embeddings = np.frombuffer(b''.join(row[4] for row in rows), dtype=np.float32).reshape(len(rows), dim)
+        return {
+            'key': key,
+            'chunks': [row[0] for row in rows],
+            'metadata': [{'page': row[1], 'start': row[2], 'end': row[3]} for row in rows],
+            'embeddings': embeddings,
+            # Term count per chunk for BM25; None until the chapter's lexical index exists
+            'term_lengths': np.frombuffer(lengths[0], dtype=np.int32) if lengths else None,
+            'generation': generation
+        }
+
+    def _write_lexical_index(self, conn, key, generation, postings, lengths):
+        conn.executemany(
+            "INSERT OR REPLACE INTO postings (chapter_key, generation, term, postings) VALUES (?, ?, ?, ?)",
+            [(key, generation, term, encode_postings(*entry)) for term, entry in postings.items()]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO chunk_lengths (chapter_key, generation, lengths) VALUES (?, ?, ?)",
+            (key, generation, np.asarray(lengths, dtype=np.int32).tobytes())
+        )
+
+    def _backfill_lexical_index(self, chapter):
+        """Index a chapter stored before BM25 indexes were written at ingestion"""
+        postings = {}
+        lengths = []
+        for idx, text in enumerate(chapter['chunks']):
+            add_chunk(postings, lengths, idx, text)
+
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT generation FROM chapters WHERE key = ?", (chapter['key'],)).fetchone()
+            # Only for the generation that is still current; a newer write brings its own index
+            if row is not None and row[0] == chapter['generation']:
+                self._write_lexical_index(conn, chapter['key'], chapter['generation'], postings, lengths)
+        chapter['term_lengths'] = np.asarray(lengths, dtype=np.int32)
+
+    def postings(self, key, generation, terms):
+        """{term: (chunk indices, term frequencies)} for the terms present in one chapter generation"""
+        terms = list(terms)
+        if not terms:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT term, postings FROM postings WHERE chapter_key = ? AND generation = ?"
+                f" AND term IN ({', '.join('?' * len(terms))})",
+                (key, generation, *terms)
+            ).fetchall()
+        return {term: decode_postings(blob) for term, blob in rows}
+
+    def writer(self, key, dim, chunker=None):
+        self._ensure_initialized()
+        return ChapterWriter(self, key, dim, chunker)
+
+    def write_chapter(self, key, chunks, embeddings, chunker=None):
+        """Store a complete chapter in one go"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        writer = self.writer(key, embeddings.shape[1], chunker)
+        try:
+            writer.append(chunks, embeddings)
+            return writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+
+    def stats(self):
+        self._ensure_initialized()
+        with self._connect() as conn:
+            chapters, chunks = conn.execute("SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM chapters").fetchone()
+        return {
+            'chapters': chapters,
+            'chunks': chunks,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+chunk_store = ChunkStore()
+
+# ===== Legacy JSON Import =====
+def legacy_chunk_paths(bucket_name, file_path):
+    """Where app.py and the chat blueprint used to keep a chapter's chunks as JSON"""
+    return [
+        os.path.join(LEGACY_CHUNKS_DIR, f"{bucket_name}_{file_path.replace('/', '_').replace('.', '_')}.json"),
+        f"{bucket_name}_{file_path.replace('/', '_').replace(' ', '')}_chunks.json"
+    ]
+
+def import_legacy_json(key, chunks_path):
+    """Encode a pre-store chunks JSON file into the store"""
+    # Interrupted writes left empty or truncated files behind; those are skipped
+    if not os.path.exists(chunks_path) or os.path.getsize(chunks_path) == 0:
+        return False
+    try:
+        with open(chunks_path, 'r') as f:
+            chunks = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not isinstance(chunks, list) or not chunks or not all(isinstance(chunk, str) for chunk in chunks):
+        return False
+
+    # The JSON held only chunk text; pages and offsets were never recorded
+    embeddings = encode_chunks(get_embedding_model(), chunks)
+    chunk_store.write_chapter(key, [{'text': chunk} for chunk in chunks], embeddings)
+    return True
+
+def load_chapter(bucket_name, object_name, requested_path=None):
+    """A chapter's stored chunks, importing its legacy JSON chunk file on first access"""
+    key = chapter_key(bucket_name, object_name)
+    chapter = chunk_store.load(key)
+    if chapter is not None:
+        return chapter
+
+    paths = legacy_chunk_paths(bucket_name, object_name)
+    if requested_path and requested_path != object_name:
+        paths += legacy_chunk_paths(bucket_name, requested_path)
+    for path in paths:
+        if import_legacy_json(key, path):
+            return chunk_store.load(key)
+    return None
@@ -0,0 +1,119 @@
+import os
+import re
+from embeddings import get_embedding_model
+
+# ===== Sentence Chunker =====
+# Pages are split on sentence boundaries into chunks that fit the embedding
+# model's token window (all-MiniLM-L6-v2 truncates everything past 256
+# tokens), and consecutive chunks share up to CHUNK_OVERLAP_TOKENS of trailing
+# sentences. Chunks never cross a page, so every chunk keeps its page number
+# and character offsets into that page's text.
+CHUNKER_VERSION = 2
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '0'))  # 0: the model's window
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+DEFAULT_WINDOW = 256
+SPECIAL_TOKENS = 2  # [CLS] and [SEP] count against the window
+
+# End of sentence (with trailing quotes/brackets) or a blank line between blocks
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n\s*\n')
+_WORD = re.compile(r'\S+')
+
+def split_sentences(text):
+    """(start, end) character spans of the sentences in text, whitespace excluded"""
+    spans = []
+    start = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        end = match.start() + len(match.group().rstrip())
+        if text[start:end].strip():
+            spans.append(_strip_span(text, start, end))
+        start = match.end()
+    if text[start:].strip():
+        spans.append(_strip_span(text, start, len(text)))
+    return spans
+
+def _strip_span(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def approximate_tokens(text):
+    # Roughly 4 word-piece tokens per 3 words of English prose
+    return (len(text.split()) * 4 + 2) // 3
+
+def token_counter(model=None):
+    """Token count function for the embedding model, approximated when it has no tokenizer"""
+    model = model or get_embedding_model()
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is not None:
+        return lambda text: len(tokenizer.tokenize(text))
+    return approximate_tokens
+
+def max_chunk_tokens(model=None):
+    if CHUNK_MAX_TOKENS:
+        return CHUNK_MAX_TOKENS
+    model = model or get_embedding_model()
+    window = getattr(model, 'max_seq_length', None) or DEFAULT_WINDOW
+    return window - SPECIAL_TOKENS
+
+def _fit_sentence(text, start, end, count_tokens, max_tokens):
+    """Spans of at most max_tokens, splitting an over-long sentence between words"""
+    tokens = count_tokens(text[start:end])
+    if tokens <= max_tokens:
+        return [(start, end, tokens)]
+
+    pieces = []
+    piece_start = None
+    piece_end = None
+    for word in _WORD.finditer(text, start, end):
+        if piece_start is not None and count_tokens(text[piece_start:word.end()]) > max_tokens:
+            pieces.append((piece_start, piece_end, count_tokens(text[piece_start:piece_end])))
+            piece_start = None
+        if piece_start is None:
+            piece_start = word.start()
+        piece_end = word.end()
+    if piece_start is not None:
+        pieces.append((piece_start, piece_end, count_tokens(text[piece_start:piece_end])))
+    return pieces
+
+def chunk_page(text, page_number, count_tokens=None, max_tokens=None, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Sentence-aligned chunks of one page: [{'text', 'page', 'start', 'end'}, ...]"""
+    if not text or not text.strip():
+        return []
+    count_tokens = count_tokens or token_counter()
+    max_tokens = max_tokens or max_chunk_tokens()
+
+    sentences = []
+    for start, end in split_sentences(text):
+        sentences.extend(_fit_sentence(text, start, end, count_tokens, max_tokens))
+
+    chunks = []
+    first = 0
+    while first < len(sentences):
+        last = first
+        total = sentences[first][2]
+        while last + 1 < len(sentences) and total + sentences[last + 1][2] <= max_tokens:
+            last += 1
+            total += sentences[last][2]
+
+        start, end = sentences[first][0], sentences[last][1]
+        chunks.append({'text': text[start:end], 'page': page_number, 'start': start, 'end': end})
+        if last + 1 >= len(sentences):
+            break
+
+        # Step back over trailing sentences for the overlap, always moving forward
+        next_first = last + 1
+        overlap = 0
+        while next_first - 1 > first and overlap + sentences[next_first - 1][2] <= overlap_tokens:
+            next_first -= 1
+            overlap += sentences[next_first][2]
+        first = next_first
+    return chunks
+
+def chunk_pages(pages, count_tokens=None, max_tokens=None):
+    """Chunks for a sequence of page texts, pages numbered from 1"""
+    count_tokens = count_tokens or token_counter()
+    max_tokens = max_tokens or max_chunk_tokens()
+    for page_number, text in enumerate(pages, start=1):
+        yield from chunk_page(text, page_number, count_tokens, max_tokens)
@@ -0,0 +1,77 @@
+import os
+import threading
+from startup import timed_import, timed_init, init_vertex_ai
+
+# ===== Pooled Clients =====
+# GCS, Gemini and plain HTTP clients are created once per process and reused,
+# keeping their auth state and keep-alive connection pools across requests.
+# Pre-fork servers (gunicorn) copy the parent's memory into each worker, but
+# sockets must not be shared across processes, so the cache is dropped in the
+# child after a fork and every worker builds its own clients.
+GCS_TIMEOUT = float(os.getenv('GCS_TIMEOUT', '30'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+
+_clients = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+def _reset_after_fork():
+    global _clients_lock, _clients_pid
+    _clients.clear()
+    _clients_lock = threading.Lock()
+    _clients_pid = os.getpid()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _get_or_create(key, factory):
+    # Belt and braces for fork paths that bypass register_at_fork
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            with timed_init(key):
+                client = factory()
+            _clients[key] = client
+    return client
+
+def _pooled_adapter():
+    adapters = timed_import('requests.adapters')
+    return adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+
+def get_storage_client():
+    """Process-wide google.cloud.storage.Client with a larger keep-alive pool"""
+    def create():
+        storage = timed_import('google.cloud.storage')
+        client = storage.Client()
+        # The client's authorized requests.Session holds the connection pool
+        client._http.mount('https://', _pooled_adapter())
+        return client
+
+    return _get_or_create('gcs_client', create)
+
+def get_generative_model(model_name="gemini-2.0-flash-001"):
+    """Process-wide Gemini model handle (Vertex AI is initialized on first use)"""
+    def create():
+        init_vertex_ai()
+        generative_models = timed_import('vertexai.generative_models')
+        return generative_models.GenerativeModel(model_name)
+
+    return _get_or_create(f"gemini:{model_name}", create)
+
+def get_http_session():
+    """Shared requests.Session for plain REST calls (e.g. Firebase sign-in)"""
+    def create():
+        requests = timed_import('requests')
+        session = requests.Session()
+        session.mount('https://', _pooled_adapter())
+        return session
+
+    return _get_or_create('http_session', create)
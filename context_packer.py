@@ -0,0 +1,109 @@
+import os
+import numpy as np
+from embeddings import normalize_query
+from chunker import split_sentences, token_counter, approximate_tokens
+from lexical_index import tokenize
+import retrieval
+
+# ===== Context Packer =====
+# Retrieved chunks are broken into sentences, exact and near-duplicate
+# sentences (overlapping chunks repeat some on purpose) are dropped, and the
+# best sentences are kept until the endpoint's token budget is spent. Kept
+# sentences go back in their original reading order. Token counts use the
+# embedding model's tokenizer, which tracks Gemini's count closely enough to
+# tune budgets with; with RETRIEVAL_MODE=bm25 they use the word-count
+# estimate so the model is never loaded.
+#
+# Nothing is encoded here: a sentence scores its chunk's retrieval score
+# (from the stored chunk embeddings and/or BM25) plus the share of the
+# question's terms it contains, and near-duplicates are found by the Jaccard
+# overlap of their index-term shingles (stopwords dropped, so "the current"
+# and "current" still match).
+CONTEXT_TOKEN_BUDGETS = {
+    'ask': int(os.getenv('CONTEXT_TOKENS_ASK', '800')),
+    'chat': int(os.getenv('CONTEXT_TOKENS_CHAT', '1000')),
+    'subject': int(os.getenv('CONTEXT_TOKENS_SUBJECT', '1000')),
+    'quiz': int(os.getenv('CONTEXT_TOKENS_QUIZ', '3000'))
+}
+# Chunks retrieved per question before packing; the budget decides how much of them is used
+CONTEXT_CANDIDATES = int(os.getenv('CONTEXT_CANDIDATES', '6'))
+DUPLICATE_JACCARD = float(os.getenv('CONTEXT_DUPLICATE_JACCARD', '0.6'))
+# Terms per shingle for the near-duplicate check
+SHINGLE_SIZE = 2
+# How much the rank of the sentence's chunk counts next to the sentence's own term overlap
+CHUNK_SCORE_WEIGHT = 0.5
+
+def context_budget(endpoint):
+    return CONTEXT_TOKEN_BUDGETS[endpoint]
+
+def _token_counter():
+    return approximate_tokens if retrieval.RETRIEVAL_MODE == 'bm25' else token_counter()
+
+def count_tokens(text):
+    return _token_counter()(text)
+
+def _shingles(terms, key):
+    """Term n-grams of a sentence; a sentence too short for one is its own shingle"""
+    if len(terms) < SHINGLE_SIZE:
+        return {key}
+    return {' '.join(terms[i:i + SHINGLE_SIZE]) for i in range(len(terms) - SHINGLE_SIZE + 1)}
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+def _split_into_sentences(ranked_chunks):
+    sentences = []  # (text, chunk score, terms, shingles)
+    seen = set()
+    duplicates = 0
+    for chunk, chunk_score in ranked_chunks:
+        for start, end in split_sentences(chunk):
+            text = ' '.join(chunk[start:end].split())
+            key = normalize_query(text)
+            if not key:
+                continue
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            terms = tokenize(text)
+            sentences.append((text, float(chunk_score), set(terms), _shingles(terms, key)))
+    return sentences, duplicates
+
+def pack_context(ranked_chunks, budget, question=None):
+    """Pack [(chunk, score), ...] (best first) into at most budget tokens
+
+    Returns (context, stats). Without a question the sentences keep their
+    chunk order, which is what the quiz wants.
+    """
+    sentences, duplicates = _split_into_sentences(ranked_chunks)
+    stats = {'budget': budget, 'context_tokens': 0, 'sentences': 0, 'duplicates_removed': duplicates}
+    if not sentences:
+        return "", stats
+
+    counter = _token_counter()
+    scores = np.array([chunk_score for _, chunk_score, _, _ in sentences], dtype=np.float32) * CHUNK_SCORE_WEIGHT
+    query_terms = set(tokenize(question)) if question else set()
+    if query_terms:
+        scores += np.array([len(query_terms & terms) / len(query_terms)
+                            for _, _, terms, _ in sentences], dtype=np.float32)
+    # Stable sort: equal scores keep their original order
+    order = np.argsort(-scores, kind='stable')
+
+    kept = []
+    used = 0
+    for i in order:
+        shingles = sentences[i][3]
+        if any(_jaccard(shingles, sentences[j][3]) >= DUPLICATE_JACCARD for j in kept):
+            stats['duplicates_removed'] += 1
+            continue
+        tokens = counter(sentences[i][0])
+        if used + tokens > budget:
+            # A shorter, lower-ranked sentence may still fit
+            continue
+        kept.append(int(i))
+        used += tokens
+
+    kept.sort()
+    stats['context_tokens'] = used
+    stats['sentences'] = len(kept)
+    return " ".join(sentences[i][0] for i in kept), stats
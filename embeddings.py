@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from startup import timed_import, timed_init
+
+DEFAULT_EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+
+# ===== Shared Model Registry =====
+# One model instance per process, shared by app.py and the chat blueprint
+_models = {}
+_models_lock = threading.Lock()
+
+def get_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL):
+    """Return the process-wide embedding model, loading it on first use"""
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            # Deferred so processes that never embed (auth pages, CLI tools) skip torch
+            sentence_transformers = timed_import('sentence_transformers')
+            with timed_init(f"embedding_model:{model_name}"):
+                model = sentence_transformers.SentenceTransformer(model_name)
+            _models[model_name] = model
+    return model
+
+def warm_up_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL):
+    """Load the model and run a throwaway encode so the first real request is fast"""
+    model = get_embedding_model(model_name)
+    model.encode(["warm up"], normalize_embeddings=True)
+    return model
+
+
+# ===== Query Embedding Cache =====
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '10000'))
+
+def normalize_query(query):
+    """Fold case, punctuation and whitespace so equivalent questions share a cache key"""
+    query = re.sub(r'[^\w\s]', ' ', query.lower())
+    return ' '.join(query.split())
+
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU of query embeddings keyed on normalized question text"""
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key, embedding):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+_query_cache = QueryEmbeddingCache()
+
+def encode_query(query):
+    """Normalized query embedding, served from the shared LRU cache when possible"""
+    key = normalize_query(query)
+    embedding = _query_cache.get(key)
+    if embedding is None:
+        embedding = get_embedding_model().encode([query], normalize_embeddings=True)[0]
+        embedding = np.asarray(embedding, dtype=np.float32)
+        # Cached arrays are shared between requests, so make them read-only
+        embedding.setflags(write=False)
+        _query_cache.put(key, embedding)
+    return embedding
+
+def query_cache_stats():
+    return _query_cache.stats()
+
+# ===== Chunk Encoding =====
+def encode_chunks(model, chunks, batch_size=32):
+    """Encode all chunks in batches into a normalized float32 matrix"""
+    if not chunks:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    matrix = model.encode(
+        chunks,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+# ===== Vectorized Scoring =====
+def top_k_indices(matrix, query_embedding, top_k=3):
+    """Score every chunk with one matrix-vector product and return the best (indices, scores)"""
+    scores = np.asarray(matrix @ np.asarray(query_embedding, dtype=np.float32))
+    top_k = min(top_k, scores.shape[0])
+    if top_k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    if top_k < scores.shape[0]:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(scores.shape[0])
+
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return order, scores[order]
@@ -0,0 +1,58 @@
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock within the process only
+    fcntl = None
+
+# ===== Cross-Process File Locks =====
+# Workers on one host serialize on an exclusive flock of a lock file. The lock
+# is taken with LOCK_NB and retried every LOCK_POLL_INTERVAL seconds instead
+# of blocking in the kernel, so a waiting request sleeps in time.sleep, which
+# yields to other greenlets under gevent rather than stalling the whole worker.
+# Without fcntl (Windows) only threads of the same process are serialized.
+LOCK_POLL_INTERVAL = 0.05
+CROSS_PROCESS = fcntl is not None
+
+_local_locks = {}  # lock file path -> threading.Lock, used when fcntl is missing
+_local_locks_guard = threading.Lock()
+
+def lock_file(f, timeout=None):
+    """Exclusively lock the open file f; (acquired, had to wait for another process)"""
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True, False
+    except BlockingIOError:
+        pass
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while deadline is None or time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True, True
+        except BlockingIOError:
+            continue
+    return False, True
+
+def unlock_file(f):
+    fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on the lock file at path for the with block"""
+    if not CROSS_PROCESS:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(path, threading.Lock())
+        with lock:
+            yield
+        return
+
+    with open(path, 'a') as f:
+        lock_file(f)
+        try:
+            yield
+        finally:
+            unlock_file(f)
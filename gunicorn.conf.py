@@ -0,0 +1,29 @@
+import os
+
+# ===== Gunicorn Settings =====
+# Read automatically by `gunicorn app:app` started from the repo root;
+# command-line flags still win over anything set here.
+#
+# SERVING_MODE=sync (default): a worker process serves one request at a time,
+# so concurrency equals WEB_CONCURRENCY and every other request queues while
+# the workers wait on Gemini.
+# SERVING_MODE=gevent: every request runs in a greenlet and blocking network
+# I/O (Gemini and Firestore over gRPC, GCS and Firebase Auth over HTTP, SMTP)
+# yields to the other requests, so one worker holds up to
+# GEVENT_WORKER_CONNECTIONS requests in flight. CPU work (embedding the
+# question, packing the context) still runs one request at a time per worker,
+# so keep WEB_CONCURRENCY at about the number of cores.
+SERVING_MODE = os.getenv('SERVING_MODE', 'sync')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = 'gevent' if SERVING_MODE == 'gevent' else 'sync'
+worker_connections = int(os.getenv('GEVENT_WORKER_CONNECTIONS', '200'))
+# Streamed answers and the first question on a new chapter (ingestion) can run long
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+def post_worker_init(worker):
+    if SERVING_MODE == 'gevent':
+        # gRPC polls its sockets itself, which would block every greenlet in the worker
+        from grpc.experimental import gevent as grpc_gevent
+        grpc_gevent.init_gevent()
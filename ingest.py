@@ -0,0 +1,145 @@
+"""Offline bulk ingestion of the NCERT bucket (or a local mirror of it).
+
+Every PDF under the prefix is downloaded and streamed through the chunking and
+embedding pipeline in a process pool, then added to the corpus index so no
+student has to wait for a chapter to be ingested on first use. Re-runs only
+process objects whose MD5/generation (or the chunker) changed since the last
+successful run.
+
+    python ingest.py --prefix NCERT/ --workers 4
+    python ingest.py --local-dir /data/bucket-mirror --prefix NCERT/
+"""
+import os
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import bucket_manifest
+import pdf_extract
+from pdf_cache import fetch_pdf_path
+from pdf_pipeline import stream_pdf_to_store
+from chunker import CHUNKER_VERSION
+from chunk_store import chunk_store, chapter_key
+from ann_index import index_chapter
+from embeddings import warm_up_embedding_model
+
+DEFAULT_BUCKET = "rag-project-storagebucket"
+DEFAULT_STATE_PATH = os.path.join("chunks", "ingest_state.json")
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(path, state):
+    """Write the ingest state atomically so an interrupted run never corrupts it"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def object_version(info):
+    """Identity of an object's content: MD5 when GCS has one, else its generation"""
+    return info.get('md5_hash') or str(info.get('generation'))
+
+def is_current(state, bucket_name, info):
+    entry = state.get(f"{bucket_name}/{info['name']}")
+    return (
+        entry is not None
+        and entry.get('version') == object_version(info)
+        # Chunks from an older chunker are re-ingested as well
+        and entry.get('chunker') == CHUNKER_VERSION
+        and chunk_store.chapter_info(chapter_key(bucket_name, info['name'])) is not None
+    )
+
+def _init_worker(local_dir):
+    if local_dir:
+        bucket_manifest.LOCAL_BUCKET_DIR = local_dir
+    # The pool already runs one PDF per core; nested page pools would oversubscribe
+    pdf_extract.PDF_EXTRACT_WORKERS = 1
+    # Each worker process loads the model once and reuses it for all its PDFs
+    warm_up_embedding_model()
+
+def ingest_object(bucket_name, object_name):
+    """Download, chunk, embed and store one PDF; runs inside a pool worker"""
+    started = time.perf_counter()
+    key = chapter_key(bucket_name, object_name)
+    result = stream_pdf_to_store(fetch_pdf_path(bucket_name, object_name), key)
+    # Always replace: a re-ingest must drop the chapter's old rows from its partition
+    chapter = chunk_store.load(key)
+    index_chapter(object_name, chapter['chunks'], chapter['embeddings'], chapter['generation'])
+
+    return {
+        'pages': result['pages'],
+        'chunks': result['chunks'],
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest chapter PDFs into the chunk store")
+    parser.add_argument('--bucket', default=DEFAULT_BUCKET)
+    parser.add_argument('--prefix', default='', help="Only ingest objects under this prefix, e.g. NCERT/")
+    parser.add_argument('--local-dir', help="Read from a local mirror (one sub-directory per bucket) instead of GCS")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help="Where the per-object ingest state is kept")
+    parser.add_argument('--force', action='store_true', help="Re-ingest every object, changed or not")
+    args = parser.parse_args(argv)
+
+    if args.local_dir:
+        bucket_manifest.LOCAL_BUCKET_DIR = args.local_dir
+
+    # Forked workers inherit this listing, so pdf_cache never lists the bucket again
+    manifest = bucket_manifest.get_manifest(args.bucket)
+    manifest.prefix = args.prefix
+    manifest.refresh()
+
+    pdfs = [info for name, info in sorted(manifest.objects.items()) if name.lower().endswith('.pdf')]
+    state = load_state(args.state)
+    pending = [info for info in pdfs if args.force or not is_current(state, args.bucket, info)]
+    print(f"{len(pdfs)} PDFs under gs://{args.bucket}/{args.prefix}: "
+          f"{len(pending)} to ingest, {len(pdfs) - len(pending)} unchanged")
+
+    totals = {'pages': 0, 'chunks': 0, 'ingested': 0, 'failed': 0}
+    started = time.perf_counter()
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.local_dir,)) as pool:
+            futures = {pool.submit(ingest_object, args.bucket, info['name']): info for info in pending}
+            for future in as_completed(futures):
+                info = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    totals['failed'] += 1
+                    print(f"FAILED {info['name']}: {str(e)}")
+                    traceback.print_exc()
+                    continue
+
+                totals['ingested'] += 1
+                totals['pages'] += result['pages']
+                totals['chunks'] += result['chunks']
+                state[f"{args.bucket}/{info['name']}"] = {
+                    'version': object_version(info),
+                    'chunker': CHUNKER_VERSION,
+                    'pages': result['pages'],
+                    'chunks': result['chunks'],
+                    'ingested_at': time.time()
+                }
+                # Saved after every object so an interrupted run resumes where it stopped
+                save_state(args.state, state)
+                print(f"ok {info['name']}: {result['pages']} pages, {result['chunks']} chunks in {result['seconds']}s")
+
+    elapsed = time.perf_counter() - started
+    print(f"\nIngested {totals['ingested']} PDFs ({totals['failed']} failed) in {elapsed:.1f}s")
+    if elapsed > 0 and totals['ingested']:
+        print(f"Throughput: {totals['pages'] / elapsed:.1f} pages/s, {totals['chunks'] / elapsed:.1f} chunks/s "
+              f"with {args.workers} workers")
+    return 1 if totals['failed'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+import re
+import math
+from collections import Counter
+import numpy as np
+
+# ===== BM25 Lexical Index =====
+# Chunk text is reduced to lowercase terms (stopwords dropped, possessives and
+# plain plurals folded, so "Ohm's laws" matches "ohm law"). At ingestion the
+# chunk store keeps one postings list per term and chapter, the chunk indices
+# and term frequencies, plus every chunk's term count. A query only reads the
+# postings of its own terms.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he
+her here hers him his how i if in into is it its itself just me more most my no nor not of off on once
+only or other our ours out over own same she should so some such than that the their theirs them then
+there these they this those through to too under until up very was we were what when where which while
+who whom why will with would you your yours
+""".split())
+
+_TERM = re.compile(r"[a-z0-9]+")
+
+def _fold(term):
+    # Plain plurals only: "laws" -> "law", but "class", "gas" and "this" stay
+    if len(term) > 3 and term.endswith('s') and not term.endswith(('ss', 'us', 'is')):
+        return term[:-1]
+    return term
+
+def tokenize(text):
+    """Index terms of a text, in order"""
+    text = re.sub(r"['’]s\b", ' ', text.lower())
+    return [_fold(term) for term in _TERM.findall(text) if len(term) > 1 and term not in STOPWORDS]
+
+def add_chunk(postings, lengths, idx, text):
+    """Add chunk idx to in-memory postings ({term: (indices, frequencies)}) and chunk term counts"""
+    counts = Counter(tokenize(text))
+    lengths.append(sum(counts.values()))
+    for term, frequency in counts.items():
+        indices, frequencies = postings.setdefault(term, ([], []))
+        indices.append(idx)
+        frequencies.append(frequency)
+
+def encode_postings(indices, frequencies):
+    return np.concatenate([
+        np.asarray(indices, dtype=np.int32), np.asarray(frequencies, dtype=np.int32)
+    ]).tobytes()
+
+def decode_postings(blob):
+    """(chunk indices, term frequencies) of one stored postings list"""
+    values = np.frombuffer(blob, dtype=np.int32)
+    half = values.shape[0] // 2
+    return values[:half], values[half:]
+
+def bm25_scores(postings, chunk_lengths):
+    """BM25 score of every chunk for the query terms whose postings are given"""
+    lengths = np.asarray(chunk_lengths, dtype=np.float32)
+    scores = np.zeros(lengths.shape[0], dtype=np.float32)
+    if not lengths.shape[0]:
+        return scores
+
+    average = max(float(lengths.mean()), 1.0)
+    count = lengths.shape[0]
+    for indices, frequencies in postings.values():
+        idf = math.log(1 + (count - len(indices) + 0.5) / (len(indices) + 0.5))
+        tf = frequencies.astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[indices] / average)
+        scores[indices] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+def top_scored(scores, top_k):
+    """(indices, scores) of the best positive scores, best first"""
+    matched = np.flatnonzero(scores > 0)
+    order = matched[np.argsort(-scores[matched], kind='stable')][:top_k]
+    return order, scores[order]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked index lists: {index: sum of 1 / (k + rank)} over the lists it appears in"""
+    fused = {}
+    for ranking in rankings:
+        for rank, index in enumerate(ranking, start=1):
+            fused[int(index)] = fused.get(int(index), 0.0) + 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,214 @@
+import os
+import time
+import random
+import threading
+from startup import lazy_import
+
+google_exceptions = lazy_import('google.api_core.exceptions')
+
+# ===== Gemini Admission Control =====
+# Every Gemini call goes through one gate per process:
+# - at most LLM_MAX_CONCURRENCY calls run at once; a caller waits at most
+#   LLM_QUEUE_TIMEOUT seconds for a slot and is then turned away, so a slow
+#   Vertex cannot pile up every request in the worker behind it;
+# - transient errors (429, 5xx, deadline, connection) are retried up to
+#   LLM_MAX_ATTEMPTS times with jittered exponential backoff, outside the slot;
+# - LLM_BREAKER_THRESHOLD transient failures in a row open the circuit: calls
+#   fail fast for LLM_BREAKER_COOLDOWN seconds, then one trial call decides
+#   whether it closes again.
+# Turned-away calls raise LLMUnavailable, whose message is safe to show users.
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', '10'))
+LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', '3'))
+LLM_RETRY_BASE = float(os.getenv('LLM_RETRY_BASE', '0.5'))
+LLM_RETRY_MAX = float(os.getenv('LLM_RETRY_MAX', '8'))
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+
+BUSY_MESSAGE = "The tutor is answering too many questions right now. Please try again in a moment."
+UNAVAILABLE_MESSAGE = "The AI service is temporarily unavailable. Please try again in a minute."
+
+class LLMUnavailable(Exception):
+    """Gemini call refused by the gate (reason: 'queue_timeout' or 'circuit_open')"""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+def is_transient(error):
+    """Whether a failed Gemini call is worth retrying"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        transient = (
+            google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded, google_exceptions.Aborted
+        )
+    except ImportError:
+        return False
+    return isinstance(error, transient)
+
+class LLMGate:
+    """Concurrency limit, retries and circuit breaker around upstream model calls"""
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, queue_timeout=LLM_QUEUE_TIMEOUT,
+                 max_attempts=LLM_MAX_ATTEMPTS, retry_base=LLM_RETRY_BASE, retry_max=LLM_RETRY_MAX,
+                 breaker_threshold=LLM_BREAKER_THRESHOLD, breaker_cooldown=LLM_BREAKER_COOLDOWN):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._state = 'closed'  # closed -> open -> half_open -> closed (or open again)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._stats = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                       'rejected_queue_timeout': 0, 'rejected_circuit_open': 0, 'circuit_opened': 0}
+
+    # --- circuit breaker ---
+    def _admit(self):
+        """Check the breaker before an attempt; returns whether this attempt is the half-open trial"""
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.breaker_cooldown:
+                self._state = 'half_open'
+            if self._state == 'closed':
+                return False
+            if self._state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats['rejected_circuit_open'] += 1
+        raise LLMUnavailable(UNAVAILABLE_MESSAGE, 'circuit_open')
+
+    def _record(self, error, trial):
+        """Update the breaker with the outcome of an attempt; returns whether to retry it"""
+        transient = error is not None and is_transient(error)
+        with self._lock:
+            if trial:
+                self._trial_in_flight = False
+            if error is None:
+                self._stats['successes'] += 1
+            else:
+                self._stats['failures'] += 1
+
+            if not transient:
+                # Success, or an error Gemini answered with (bad request, safety block): upstream is healthy
+                self._state = 'closed'
+                self._consecutive_failures = 0
+                return False
+
+            self._consecutive_failures += 1
+            if self._state == 'half_open' or self._consecutive_failures >= self.breaker_threshold:
+                if self._state != 'open':
+                    self._stats['circuit_opened'] += 1
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+            return True
+
+    def _abandon(self, trial):
+        # An attempt cut short (client went away mid-stream) must not leave the trial slot taken
+        if trial:
+            with self._lock:
+                self._trial_in_flight = False
+
+    # --- concurrency slots ---
+    def _acquire(self):
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._waiting -= 1
+            if acquired:
+                self._active += 1
+            else:
+                self._stats['rejected_queue_timeout'] += 1
+        if not acquired:
+            raise LLMUnavailable(BUSY_MESSAGE, 'queue_timeout')
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def _backoff(self, attempt):
+        with self._lock:
+            self._stats['retries'] += 1
+        delay = min(self.retry_max, self.retry_base * (2 ** (attempt - 1)))
+        time.sleep(random.uniform(0, delay))
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) through the gate, retried on transient errors"""
+        with self._lock:
+            self._stats['calls'] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            trial = self._admit()
+            try:
+                self._acquire()
+            except LLMUnavailable:
+                self._abandon(trial)
+                raise
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                retry = self._record(e, trial)
+                if not retry or attempt == self.max_attempts:
+                    raise
+            else:
+                self._record(None, trial)
+                return result
+            finally:
+                self._release()
+            self._backoff(attempt)
+
+    def stream(self, fn, *args, **kwargs):
+        """Iterate fn(*args, **kwargs) holding one slot; retried only if nothing was yielded yet"""
+        with self._lock:
+            self._stats['calls'] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            trial = self._admit()
+            try:
+                self._acquire()
+            except LLMUnavailable:
+                self._abandon(trial)
+                raise
+            started = False
+            recorded = False
+            try:
+                for item in fn(*args, **kwargs):
+                    started = True
+                    yield item
+            except Exception as e:
+                recorded = True
+                retry = self._record(e, trial)
+                if started or not retry or attempt == self.max_attempts:
+                    raise
+            else:
+                recorded = True
+                self._record(None, trial)
+                return
+            finally:
+                if not recorded:
+                    self._abandon(trial)
+                self._release()
+            self._backoff(attempt)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                state=self._state,
+                queue_depth=self._waiting,
+                in_flight=self._active,
+                max_concurrency=self.max_concurrency,
+                consecutive_failures=self._consecutive_failures
+            )
+        return stats
+
+llm_gate = LLMGate()
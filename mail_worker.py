@@ -0,0 +1,145 @@
+import os
+import atexit
+import queue
+import random
+import smtplib
+import threading
+
+# ===== Background Mail Queue =====
+# OTP and password-reset emails are queued and sent by a worker thread, so
+# the request returns as soon as the message is queued. The worker keeps one
+# SMTP connection open between messages (closed after MAIL_IDLE_TIMEOUT
+# seconds without mail, before the server drops it) and reconnects when a
+# send fails. A failed message is retried up to MAIL_MAX_ATTEMPTS times with
+# jittered exponential backoff, then dropped and logged.
+#
+# The server comes from MAIL_SERVER / MAIL_PORT / MAIL_USE_TLS / MAIL_USE_SSL,
+# so tests can point the app at a local stand-in, e.g.
+#   python -m aiosmtpd -n -l localhost:1025
+#   MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0
+# Queued mail lives in memory only: it is drained at interpreter exit (for up
+# to MAIL_DRAIN_TIMEOUT seconds) and lost if the process is killed.
+MAIL_QUEUE_SIZE = int(os.getenv('MAIL_QUEUE_SIZE', '1000'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '4'))
+MAIL_RETRY_BASE = float(os.getenv('MAIL_RETRY_BASE', '1'))
+MAIL_IDLE_TIMEOUT = float(os.getenv('MAIL_IDLE_TIMEOUT', '60'))
+MAIL_DRAIN_TIMEOUT = float(os.getenv('MAIL_DRAIN_TIMEOUT', '10'))
+
+class MailQueue:
+    """Sends Flask-Mail messages from a worker thread over a reused SMTP connection"""
+
+    def __init__(self, app, mail, max_size=MAIL_QUEUE_SIZE, max_attempts=MAIL_MAX_ATTEMPTS,
+                 retry_base=MAIL_RETRY_BASE, idle_timeout=MAIL_IDLE_TIMEOUT):
+        self.app = app
+        self.mail = mail
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = threading.Event()
+        self._connection = None
+        self._stats = {'queued': 0, 'sent': 0, 'retries': 0, 'failed': 0, 'connections': 0}
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # Messages queued before the fork are the parent's to send
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connection = None
+
+    def send(self, message):
+        """Queue a message; raises queue.Full when the worker is too far behind"""
+        self._queue.put_nowait(message)
+        with self._lock:
+            self._stats['queued'] += 1
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-worker', daemon=True)
+                self._thread.start()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = self.mail.connect()
+            connection.__enter__()
+            self._connection = connection
+            with self._lock:
+                self._stats['connections'] += 1
+        return self._connection
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                # Already dropped by the server
+                pass
+
+    def _deliver(self, message):
+        """Send one message, reconnecting and backing off between attempts"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with self.app.app_context():
+                    self._connect().send(message)
+                with self._lock:
+                    self._stats['sent'] += 1
+                return
+            except Exception as e:
+                self._disconnect()
+                if attempt == self.max_attempts:
+                    with self._lock:
+                        self._stats['failed'] += 1
+                    self.app.logger.error(f"Giving up on email '{message.subject}' to {message.recipients} "
+                                          f"after {attempt} attempts: {str(e)}")
+                    return
+                with self._lock:
+                    self._stats['retries'] += 1
+                delay = self.retry_base * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                self.app.logger.warning(f"Error sending email '{message.subject}' (attempt {attempt}), "
+                                        f"retrying in {delay:.1f}s: {str(e)}")
+                # Cut short at shutdown so the drain is not spent sleeping
+                self._closed.wait(delay)
+
+    def _run(self):
+        while True:
+            try:
+                message = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                if self._closed.is_set():
+                    return
+                continue
+            if message is None:
+                self._disconnect()
+                return
+            try:
+                self._deliver(message)
+            finally:
+                self._queue.task_done()
+
+    def close(self, timeout=MAIL_DRAIN_TIMEOUT):
+        """Send what is queued (waiting at most timeout seconds) and stop the worker"""
+        self._closed.set()
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
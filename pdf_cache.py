@@ -0,0 +1,122 @@
+import os
+import base64
+import hashlib
+import threading
+from bucket_manifest import get_bucket, get_manifest
+from clients import GCS_TIMEOUT
+from file_lock import locked
+
+# ===== Local PDF Cache =====
+# Downloaded PDFs are kept on disk under a content address (the object's MD5,
+# or its generation when GCS has no MD5) and evicted least recently used first
+# once the cache grows past its byte budget. A per-object file lock makes
+# concurrent workers wait for a single download, and files are written under
+# a temporary name and renamed into place so nobody reads a half-written PDF.
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'pdf_cache')
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def _object_metadata(bucket_name, object_name):
+    info = get_manifest(bucket_name).info(object_name)
+    if info is not None:
+        return info
+
+    blob = get_bucket(bucket_name).blob(object_name)
+    blob.reload(timeout=GCS_TIMEOUT)
+    return {'md5_hash': blob.md5_hash, 'generation': blob.generation}
+
+def cache_key(bucket_name, object_name, metadata):
+    """Content address for an object version"""
+    if metadata.get('md5_hash'):
+        return base64.b64decode(metadata['md5_hash']).hex()
+    # Composite objects have no MD5; the generation still pins the exact version
+    version = f"{bucket_name}/{object_name}#{metadata['generation']}"
+    return hashlib.sha256(version.encode()).hexdigest()
+
+def _cache_path(key):
+    return os.path.join(PDF_CACHE_DIR, key[:2], f"{key}.pdf")
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return base64.b64encode(digest.digest()).decode()
+
+def _download(bucket_name, object_name, path, expected_md5):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        # Streamed straight to disk so a large scanned textbook is never held in memory
+        get_bucket(bucket_name).blob(object_name).download_to_filename(tmp_path, timeout=GCS_TIMEOUT)
+        if expected_md5 and _file_md5(tmp_path) != expected_md5:
+            raise IOError(f"Checksum mismatch downloading gs://{bucket_name}/{object_name}")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _evict(keep_path):
+    """Delete least recently used PDFs until the cache fits its byte budget"""
+    files = []
+    total = 0
+    for dirpath, _, filenames in os.walk(PDF_CACHE_DIR):
+        for filename in filenames:
+            if not filename.endswith('.pdf'):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    for _, size, path in sorted(files):
+        if total <= PDF_CACHE_MAX_BYTES:
+            break
+        if path == keep_path:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            _count('evictions')
+        except FileNotFoundError:
+            pass
+
+def fetch_pdf_path(bucket_name, object_name):
+    """Local path of the cached PDF, downloading it once if needed"""
+    metadata = _object_metadata(bucket_name, object_name)
+    path = _cache_path(cache_key(bucket_name, object_name, metadata))
+
+    if os.path.exists(path):
+        os.utime(path)  # mtime doubles as the LRU clock
+        _count('hits')
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with locked(f"{path}.lock"):
+        # Another worker may have finished the download while we waited
+        if os.path.exists(path):
+            os.utime(path)
+            _count('hits')
+            return path
+
+        _count('misses')
+        _download(bucket_name, object_name, path, metadata.get('md5_hash'))
+
+    _evict(keep_path=path)
+    return path
+
+def pdf_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['max_bytes'] = PDF_CACHE_MAX_BYTES
+    return stats
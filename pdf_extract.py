@@ -0,0 +1,72 @@
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from startup import lazy_import
+
+PyPDF2 = lazy_import('PyPDF2')
+
+# ===== Page Text Extraction =====
+# Short PDFs are extracted in-process. Above the page threshold the pages are
+# split into contiguous ranges, extracted in worker processes and reassembled
+# in page order. Every page is extracted exactly once.
+PARALLEL_PAGE_THRESHOLD = int(os.getenv('PDF_PARALLEL_PAGE_THRESHOLD', '40'))
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Long-lived pool; spawned (not forked) so workers never inherit server threads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+def _open_reader(source):
+    """PdfReader over a local file path (read lazily) or in-memory PDF bytes"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return PyPDF2.PdfReader(io.BytesIO(source))
+    return PyPDF2.PdfReader(source)
+
+def _extract_range(source, start, stop):
+    reader = _open_reader(source)
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+def _page_ranges(page_count, parts):
+    size = -(-page_count // parts)  # ceiling division
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def iter_pages(source):
+    """Yield the text of every page in order ('' for pages without text)
+
+    source is a local file path or the PDF bytes. Workers open a path
+    themselves, so a file on disk is never copied through the pool.
+    """
+    reader = _open_reader(source)
+    page_count = len(reader.pages)
+
+    if page_count < PARALLEL_PAGE_THRESHOLD or PDF_EXTRACT_WORKERS <= 1:
+        for page in reader.pages:
+            yield page.extract_text() or ''
+        return
+
+    # Two ranges per worker evens out pages that are slower to parse
+    ranges = _page_ranges(page_count, PDF_EXTRACT_WORKERS * 2)
+    executor = _get_executor()
+    futures = [executor.submit(_extract_range, source, start, stop) for start, stop in ranges]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def extract_pages(source):
+    """Text of every page in order ('' for pages without text)"""
+    return list(iter_pages(source))
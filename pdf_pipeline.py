@@ -0,0 +1,95 @@
+import os
+import queue
+import threading
+from pdf_extract import iter_pages
+from embeddings import get_embedding_model, encode_chunks
+from chunker import CHUNKER_VERSION, chunk_page, token_counter, max_chunk_tokens
+from chunk_store import chunk_store
+
+# ===== Streaming PDF Ingestion =====
+# A PDF is read from a local file page by page, each page is split into chunks,
+# chunks are embedded in fixed-size batches and appended to the chunk store as
+# they arrive. Extraction runs in its own thread behind a bounded queue so it
+# overlaps with embedding, and peak memory depends on the batch and queue
+# sizes rather than on the size of the PDF.
+EMBED_BATCH_SIZE = int(os.getenv('INGEST_EMBED_BATCH_SIZE', '32'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '128'))
+
+_DONE = object()
+
+def _produce_chunks(source, split_page, chunks_queue, stop, stats):
+    """Extraction thread: pages -> chunks onto the bounded queue"""
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for page_number, text in enumerate(iter_pages(source), start=1):
+            stats['pages'] += 1
+            for chunk in split_page(text, page_number):
+                if not put(chunk):
+                    return
+        put(_DONE)
+    except Exception as e:
+        put(e)
+
+def _encode_batch(model, batch, batch_size):
+    return encode_chunks(model, [chunk['text'] for chunk in batch], batch_size=batch_size)
+
+def stream_pdf_to_store(source, key, split_page=None, model=None, batch_size=EMBED_BATCH_SIZE):
+    """Extract, chunk, embed and store one PDF with bounded memory
+
+    source is a local PDF path (or bytes), key the chapter's chunk store
+    key (see chunk_store.chapter_key). split_page(text, page_number)
+    returns the chunk dicts of one page and defaults to the sentence chunker
+    sized to the model's window. Returns {'pages': ..., 'chunks': ...}.
+    """
+    model = model or get_embedding_model()
+    if split_page is None:
+        count_tokens = token_counter(model)
+        max_tokens = max_chunk_tokens(model)
+        split_page = lambda text, page_number: chunk_page(text, page_number, count_tokens, max_tokens)
+    writer = chunk_store.writer(key, model.get_sentence_embedding_dimension(), CHUNKER_VERSION)
+    chunks_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    stats = {'pages': 0, 'chunks': 0}
+
+    producer = threading.Thread(
+        target=_produce_chunks,
+        args=(source, split_page, chunks_queue, stop, stats),
+        name='pdf-extract',
+        daemon=True
+    )
+    producer.start()
+
+    try:
+        batch = []
+        while True:
+            item = chunks_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            batch.append(item)
+            if len(batch) >= batch_size:
+                writer.append(batch, _encode_batch(model, batch, batch_size))
+                batch = []
+
+        if batch:
+            writer.append(batch, _encode_batch(model, batch, batch_size))
+        writer.commit()
+    except BaseException:
+        stop.set()
+        writer.abort()
+        raise
+    finally:
+        producer.join()
+
+    stats['chunks'] = writer.count
+    return stats
@@ -0,0 +1,65 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# ===== User Profile Cache =====
+# The Firebase uid is kept in the session from login/verify-otp onwards, and
+# the Firestore profile fields (board, class, stream) are cached per uid for a
+# few minutes. The dashboard and quiz pages call /api/user and
+# /api/get-subjects back to back, which now cost at most one Firestore read
+# per user per TTL instead of an Auth lookup plus a Firestore read each.
+# Writers of profile fields call invalidate(); other workers pick the change
+# up when their entry expires.
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '300'))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('PROFILE_CACHE_MAX_ENTRIES', '10000'))
+PROFILE_FIELDS = ('board', 'class', 'stream')
+
+class ProfileCache:
+    """Thread-safe TTL + LRU cache of user profiles keyed by uid"""
+
+    def __init__(self, ttl=PROFILE_CACHE_TTL, max_entries=PROFILE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # uid -> (stored_at, profile)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, uid):
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self._entries.pop(uid, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(uid)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, uid, profile):
+        """Cache the profile fields of a user document and return a copy of them"""
+        profile = {field: profile.get(field) for field in PROFILE_FIELDS}
+        with self._lock:
+            self._entries[uid] = (time.time(), profile)
+            self._entries.move_to_end(uid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(profile)
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._entries.pop(uid, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+profile_cache = ProfileCache()
@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import threading
+from contextlib import closing
+from singleflight import quiz_flight
+
+# ===== Quiz Question Bank =====
+# Validated questions are pre-generated into a pool per
+# (board, class, subject, chapter, difficulty). A quiz request samples from the
+# pool; when the pool runs low it is topped up in a background thread.
+# A question is retired once it has been served QUIZ_MAX_SERVES times or is
+# older than QUIZ_QUESTION_TTL seconds, so pools keep turning over and a
+# re-ingested chapter's old questions age out.
+QUIZ_BANK_PATH = os.getenv('QUIZ_BANK_PATH', 'quiz_bank.sqlite3')
+QUIZ_POOL_TARGET = int(os.getenv('QUIZ_POOL_TARGET', '40'))
+QUIZ_POOL_LOW_WATERMARK = int(os.getenv('QUIZ_POOL_LOW_WATERMARK', '20'))
+QUIZ_MAX_SERVES = int(os.getenv('QUIZ_MAX_SERVES', '5'))
+QUIZ_QUESTION_TTL = int(os.getenv('QUIZ_QUESTION_TTL', str(7 * 24 * 3600)))
+QUIZ_SAMPLE_SIZE = 10
+# Stop refilling after this many generation rounds in a row add nothing new
+MAX_EMPTY_ROUNDS = 3
+
+def bank_key(board, class_level, subject, chapter, difficulty):
+    """Normalized pool key, e.g. 'ncert|8|science|1|medium'"""
+    digits = re.search(r'\d+', str(class_level))
+    class_key = digits.group() if digits else str(class_level).lower()
+    chapter_digits = re.search(r'\d+', str(chapter))
+    chapter_key = chapter_digits.group() if chapter_digits else str(chapter).lower()
+    return '|'.join([
+        str(board).lower(), class_key, str(subject).lower(), chapter_key, str(difficulty).lower()
+    ])
+
+def _question_fingerprint(question):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', question['question'].lower()).split())
+
+class QuizBank:
+    """SQLite-backed pools of validated quiz questions with background refills"""
+
+    def __init__(self, generate, path=QUIZ_BANK_PATH, target=QUIZ_POOL_TARGET,
+                 low_watermark=QUIZ_POOL_LOW_WATERMARK, max_serves=QUIZ_MAX_SERVES,
+                 ttl=QUIZ_QUESTION_TTL, logger=None):
+        # generate(board, class_level, subject, chapter, difficulty) -> [question, ...]
+        self.generate = generate
+        self.path = path
+        self.target = target
+        self.low_watermark = low_watermark
+        self.max_serves = max_serves
+        self.ttl = ttl
+        self.logger = logger
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=10))
+
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with self._connect() as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " bank_key TEXT NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " question TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " served INTEGER NOT NULL DEFAULT 0,"
+                " UNIQUE (bank_key, fingerprint))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+            if 'served' not in columns:
+                # Banks created before questions were retired
+                conn.execute("ALTER TABLE questions ADD COLUMN served INTEGER NOT NULL DEFAULT 0")
+        self._initialized = True
+
+    def _retire(self, conn, key):
+        """Delete a pool's questions that were served often enough or are too old"""
+        conn.execute(
+            "DELETE FROM questions WHERE bank_key = ? AND (served >= ? OR created_at < ?)",
+            (key, self.max_serves, time.time() - self.ttl)
+        )
+
+    def pool_size(self, key):
+        """Questions in a pool that can still be served"""
+        self._ensure_initialized()
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM questions WHERE bank_key = ? AND served < ? AND created_at >= ?",
+                (key, self.max_serves, time.time() - self.ttl)
+            ).fetchone()[0]
+
+    def add_questions(self, key, questions):
+        """Insert questions into a pool, skipping ones already in it; returns how many were new"""
+        self._ensure_initialized()
+        now = time.time()
+        with self._connect() as conn, conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (bank_key, fingerprint, question, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                [(key, _question_fingerprint(q), json.dumps(q), now) for q in questions]
+            )
+            return conn.total_changes - before
+
+    def _refill(self, key, params):
+        """Generate rounds of questions until the pool reaches its target size"""
+        self._ensure_initialized()
+        with self._connect() as conn, conn:
+            # Retired questions would otherwise block identical new ones
+            self._retire(conn, key)
+        empty_rounds = 0
+        while self.pool_size(key) < self.target and empty_rounds < MAX_EMPTY_ROUNDS:
+            added = self.add_questions(key, self.generate(*params))
+            empty_rounds = empty_rounds + 1 if added == 0 else 0
+
+    def _refill_in_background(self, key, params):
+        with self._lock:
+            if key in self._refilling:
+                return
+            self._refilling.add(key)
+
+        def run():
+            try:
+                # Another worker process refilling the same pool leaves nothing to do here
+                quiz_flight.do(f"refill|{key}", lambda: self._refill(key, params),
+                               recheck=lambda: True if self.pool_size(key) >= self.target else None)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Error refilling quiz bank {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refilling.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def sample(self, board, class_level, subject, chapter, difficulty, size=QUIZ_SAMPLE_SIZE):
+        """Random questions from the pool, generating synchronously only if it is nearly empty"""
+        params = (board, class_level, subject, chapter, difficulty)
+        key = bank_key(*params)
+
+        if self.pool_size(key) < size:
+            # Cold pool: one generation round now so this request can be served.
+            # Identical quiz requests arriving together share that round.
+            quiz_flight.do(key, lambda: self.add_questions(key, self.generate(*params)),
+                           recheck=lambda: True if self.pool_size(key) >= size else None)
+
+        with self._connect() as conn, conn:
+            self._retire(conn, key)
+            rows = conn.execute("SELECT id, question FROM questions WHERE bank_key = ?", (key,)).fetchall()
+            picked = random.sample(rows, min(size, len(rows)))
+            conn.executemany("UPDATE questions SET served = served + 1 WHERE id = ?", [(row[0],) for row in picked])
+
+        if self.pool_size(key) < self.low_watermark:
+            self._refill_in_background(key, params)
+
+        questions = [json.loads(row[1]) for row in picked]
+        return questions
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+from chunk_store import chunk_store
+from embeddings import encode_query, top_k_indices
+from lexical_index import tokenize, bm25_scores, top_scored, reciprocal_rank_fusion
+
+# ===== Chapter Retrieval =====
+# RETRIEVAL_MODE picks how a chapter's chunks are ranked for a question:
+#   dense     - cosine similarity over every chunk embedding
+#   prefilter - BM25 narrows the chapter to BM25_PREFILTER_CANDIDATES chunks,
+#               only those are scored densely (all chunks if fewer than top_k
+#               chunks match any term)
+#   hybrid    - dense and BM25 rankings fused with reciprocal rank fusion;
+#               keyword questions ("define Ohm's law") find the chunk naming
+#               the term even when its embedding ranks it lower
+#   bm25      - BM25 only; answering a chapter question never loads the
+#               embedding model (the answer cache matches question text and
+#               token budgets use the word-count estimate). ask-subject still
+#               needs it: its corpus index is searched by embedding.
+# Scores are higher-is-better with 1.0 as the ceiling: cosine similarity for
+# dense/prefilter, fused RRF scaled so that ranking first in both lists scores
+# 1.0 for hybrid, BM25 relative to the best hit for bm25.
+RETRIEVAL_MODES = ('dense', 'prefilter', 'hybrid', 'bm25')
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+BM25_PREFILTER_CANDIDATES = int(os.getenv('BM25_PREFILTER_CANDIDATES', '50'))
+# Depth of each ranking fed into the fusion
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+RRF_K = 60
+
+if RETRIEVAL_MODE not in RETRIEVAL_MODES:
+    raise ValueError(f"RETRIEVAL_MODE must be one of {', '.join(RETRIEVAL_MODES)}, not {RETRIEVAL_MODE!r}")
+
+def bm25_rank(chapter, query, top_k):
+    """(indices, BM25 scores) of the chapter's best lexical matches"""
+    terms = set(tokenize(query))
+    postings = chunk_store.postings(chapter['key'], chapter['generation'], terms)
+    return top_scored(bm25_scores(postings, chapter['term_lengths']), top_k)
+
+def dense_rank(chapter, query, top_k, candidates=None):
+    """(indices, cosine scores) over all chunks, or only over the candidate indices"""
+    embeddings = chapter['embeddings'] if candidates is None else chapter['embeddings'][candidates]
+    # Cosine similarity: both sides are normalized
+    indices, scores = top_k_indices(embeddings, encode_query(query), top_k)
+    return (indices if candidates is None else candidates[indices]), scores
+
+def rank_chunks(chapter, query, top_k, mode=None):
+    """[(chunk index, score), ...] best first for a stored chapter"""
+    mode = mode or RETRIEVAL_MODE
+    if mode == 'dense':
+        indices, scores = dense_rank(chapter, query, top_k)
+    elif mode == 'prefilter':
+        candidates, _ = bm25_rank(chapter, query, max(top_k, BM25_PREFILTER_CANDIDATES))
+        indices, scores = dense_rank(chapter, query, top_k, candidates if len(candidates) >= top_k else None)
+    elif mode == 'bm25':
+        indices, scores = bm25_rank(chapter, query, top_k)
+        if len(scores):
+            scores = scores / scores[0]
+    else:
+        depth = max(top_k, HYBRID_CANDIDATES)
+        fused = reciprocal_rank_fusion(
+            [dense_rank(chapter, query, depth)[0], bm25_rank(chapter, query, depth)[0]], k=RRF_K
+        )
+        best = sorted(fused.items(), key=lambda item: -item[1])[:top_k]
+        # Ranked first by both retrievers scores 1.0
+        ceiling = 2.0 / (RRF_K + 1)
+        indices = np.array([index for index, _ in best], dtype=np.int64)
+        scores = np.array([score / ceiling for _, score in best], dtype=np.float32)
+    return [(int(i), float(score)) for i, score in zip(indices, scores)]
+
+def cache_embedding(query):
+    """Query embedding for the answer cache, None in bm25 mode so the model stays unloaded"""
+    return None if RETRIEVAL_MODE == 'bm25' else encode_query(query)
+
+def retrieve(chapter, query, top_k=3, mode=None):
+    """[(chunk text, score), ...] best first for a stored chapter"""
+    if not chapter or not chapter['chunks'] or not query:
+        return []
+    return [(chapter['chunks'][i], score) for i, score in rank_chunks(chapter, query, top_k, mode)]
@@ -0,0 +1,175 @@
+import os
+import atexit
+import threading
+from datetime import datetime, timezone
+from startup import lazy_import
+
+firestore = lazy_import('firebase_admin.firestore')
+
+# ===== Write-Behind Score Writer =====
+# /api/save-score only queues the score. A background thread writes the
+# queued scores to Firestore every SCORE_FLUSH_INTERVAL seconds, or sooner
+# once SCORE_FLUSH_MAX_USERS users have pending scores. All of one user's
+# queued scores become a single document write, and up to 500 writes go in
+# one batched commit.
+#
+# Durability: a score the API has acknowledged lives only in this process's
+# memory until the next flush, which is at most SCORE_FLUSH_INTERVAL seconds
+# away. Queued scores are flushed on clean shutdown (interpreter exit, which
+# includes gunicorn's graceful SIGTERM handling). A hard kill (SIGKILL, OOM)
+# loses at most one interval of scores. A failed batch (or a flush that could
+# not reach Firestore at all) is re-queued and retried up to
+# SCORE_FLUSH_MAX_ATTEMPTS times, then dropped and logged.
+# With SCORE_FLUSH_INTERVAL=0 every score is written before the request
+# returns, as before.
+SCORE_FLUSH_INTERVAL = float(os.getenv('SCORE_FLUSH_INTERVAL', '2'))
+SCORE_FLUSH_MAX_USERS = int(os.getenv('SCORE_FLUSH_MAX_USERS', '200'))
+SCORE_FLUSH_MAX_ATTEMPTS = int(os.getenv('SCORE_FLUSH_MAX_ATTEMPTS', '5'))
+FIRESTORE_BATCH_LIMIT = 500
+
+class ScoreWriter:
+    """Coalesces quiz scores per user and writes them to Firestore in batches"""
+
+    def __init__(self, get_db, interval=SCORE_FLUSH_INTERVAL, max_users=SCORE_FLUSH_MAX_USERS,
+                 max_attempts=SCORE_FLUSH_MAX_ATTEMPTS, logger=None):
+        self._get_db = get_db
+        self.interval = interval
+        self.max_users = max_users
+        self.max_attempts = max_attempts
+        self.logger = logger
+        self._pending = {}  # uid -> {'scores': {subject: score}, 'history': {subject: [entry]}, 'attempts': n}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._stats = {'submitted': 0, 'user_writes': 0, 'batches': 0, 'failed_batches': 0, 'dropped_users': 0}
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # The parent still owns (and will flush) whatever was queued before the fork
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _log_error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
+
+    def submit(self, uid, subject, score):
+        """Queue one quiz score; it is written by the next flush"""
+        # Stamped now: the write itself may happen a few seconds later
+        entry = {'score': score, 'timestamp': datetime.now(timezone.utc)}
+        with self._lock:
+            pending = self._pending.setdefault(uid, {'scores': {}, 'history': {}, 'attempts': 0})
+            pending['scores'][subject] = score
+            pending['history'].setdefault(subject, []).append(entry)
+            self._stats['submitted'] += 1
+            full = len(self._pending) >= self.max_users
+
+        if self.interval <= 0 or self._closed:
+            self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._log_error(f"Score flush failed: {str(e)}")
+
+    def _requeue(self, items):
+        """Put the scores of a failed batch back, behind anything queued since"""
+        with self._lock:
+            for uid, pending in items:
+                pending['attempts'] += 1
+                if pending['attempts'] >= self.max_attempts:
+                    self._stats['dropped_users'] += 1
+                    self._log_error(f"Dropping unsaved scores for user {uid} after {pending['attempts']} attempts: "
+                                    f"{pending['scores']}")
+                    continue
+
+                newer = self._pending.get(uid)
+                if newer is not None:
+                    # Scores submitted after the failed batch are more recent and win
+                    pending['scores'].update(newer['scores'])
+                    for subject, entries in newer['history'].items():
+                        pending['history'].setdefault(subject, []).extend(entries)
+                self._pending[uid] = pending
+
+    def flush(self):
+        """Write every queued score now"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            items = list(pending.items())
+            try:
+                db = self._get_db()
+            except Exception as e:
+                # Firebase not reachable yet (init or credentials): keep every score for the next flush
+                self._stats['failed_batches'] += 1
+                self._log_error(f"Error connecting to Firestore for {len(items)} users' scores: {str(e)}")
+                self._requeue(items)
+                return
+
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                chunk = items[start:start + FIRESTORE_BATCH_LIMIT]
+                try:
+                    batch = db.batch()
+                    for uid, user_pending in chunk:
+                        # merge=True only touches the given subjects, like update() with field paths
+                        batch.set(db.collection('users').document(uid), {
+                            'scores': dict(user_pending['scores']),
+                            'scoreHistory': {
+                                subject: firestore.ArrayUnion(entries)
+                                for subject, entries in user_pending['history'].items()
+                            }
+                        }, merge=True)
+                    batch.commit()
+                except Exception as e:
+                    self._stats['failed_batches'] += 1
+                    self._log_error(f"Error writing {len(chunk)} users' scores: {str(e)}")
+                    self._requeue(chunk)
+                    continue
+                self._stats['batches'] += 1
+                self._stats['user_writes'] += len(chunk)
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        try:
+            self.flush()
+        except Exception as e:
+            self._log_error(f"Final score flush failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_users'] = len(self._pending)
+        stats['flush_interval'] = self.interval
+        return stats
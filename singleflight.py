@@ -0,0 +1,124 @@
+import os
+import hashlib
+import tempfile
+import threading
+from file_lock import CROSS_PROCESS, lock_file, unlock_file
+
+# ===== Request Coalescing (singleflight) =====
+# Concurrent calls for the same key (a chapter being ingested, a question
+# being answered, a quiz pool being filled) share one computation.
+# Within a process the first caller runs it and the others wait for its
+# result or exception. Across worker processes on the same host the caller
+# that runs it holds an exclusive file lock for the key. A process that had
+# to wait for that lock calls recheck() first, which reads what the other
+# process stored (chunk store, answer cache, quiz bank), and only computes
+# when that returns None.
+#
+# Lock files are striped (SINGLEFLIGHT_LOCK_STRIPES per flight) so their
+# number stays bounded; two keys sharing a stripe at the same moment only
+# serialize, and the recheck sends the second one on to compute. Waiting on
+# another process polls the lock (see file_lock.py) and gives up after
+# SINGLEFLIGHT_WAIT_TIMEOUT seconds and computes anyway. Without fcntl
+# (Windows) calls are only coalesced within the process.
+SINGLEFLIGHT_LOCK_DIR = os.getenv('SINGLEFLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'ai-tutor-singleflight'))
+SINGLEFLIGHT_LOCK_STRIPES = int(os.getenv('SINGLEFLIGHT_LOCK_STRIPES', '1024'))
+SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_WAIT_TIMEOUT', '300'))
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result"""
+
+    def __init__(self, name, lock_dir=SINGLEFLIGHT_LOCK_DIR, stripes=SINGLEFLIGHT_LOCK_STRIPES,
+                 wait_timeout=SINGLEFLIGHT_WAIT_TIMEOUT):
+        self.name = name
+        self.lock_dir = lock_dir if CROSS_PROCESS else None
+        self.stripes = stripes
+        self.wait_timeout = wait_timeout
+        self._calls = {}  # key -> _Call in flight in this process
+        self._lock = threading.Lock()
+        self._stats = {'computed': 0, 'coalesced': 0, 'waited_on_process': 0,
+                       'shared_across_processes': 0, 'lock_timeouts': 0}
+
+    def do(self, key, fn, recheck=None):
+        """(fn(), shared) for key, where shared says the result came from another caller"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result[0], True
+
+        try:
+            call.result = self._run_locked(key, fn, recheck)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _lock_path(self, key):
+        digest = hashlib.sha1(f"{self.name}|{key}".encode('utf-8')).digest()
+        stripe = int.from_bytes(digest[:4], 'big') % self.stripes
+        return os.path.join(self.lock_dir, f"{self.name}-{stripe}.lock")
+
+    def _acquire(self, f):
+        """Take the file lock; (acquired, had to wait for another process)"""
+        acquired, waited = lock_file(f, self.wait_timeout)
+        with self._lock:
+            if waited:
+                self._stats['waited_on_process'] += 1
+            if not acquired:
+                self._stats['lock_timeouts'] += 1
+        return acquired, waited
+
+    def _compute(self, fn):
+        with self._lock:
+            self._stats['computed'] += 1
+        return fn(), False
+
+    def _run_locked(self, key, fn, recheck):
+        if self.lock_dir is None:
+            return self._compute(fn)
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(self._lock_path(key), 'a') as f:
+            acquired, waited = self._acquire(f)
+            try:
+                if waited and recheck is not None:
+                    result = recheck()
+                    if result is not None:
+                        with self._lock:
+                            self._stats['shared_across_processes'] += 1
+                        return result, True
+                return self._compute(fn)
+            finally:
+                if acquired:
+                    unlock_file(f)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+ingest_flight = SingleFlight('ingest')
+answer_flight = SingleFlight('answer')
+quiz_flight = SingleFlight('quiz')
+
+def singleflight_stats():
+    return {flight.name: flight.stats() for flight in (ingest_flight, answer_flight, quiz_flight)}
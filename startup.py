@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import threading
+import importlib
+from contextlib import contextmanager
+
+# ===== Cold-Start Report =====
+# Heavy dependencies (torch, Vertex AI, GCS, Firebase, PyPDF2) are imported on
+# first use instead of at module load, and every deferred import or one-time
+# initializer records how long it took so the cost of a cold worker is visible.
+_process_start = time.perf_counter()
+_report_lock = threading.Lock()
+_imports = []
+_initializers = []
+_ready_seconds = None
+_completed_inits = set()
+_init_locks = {}
+
+def _record(entries, name, started):
+    elapsed = time.perf_counter() - started
+    with _report_lock:
+        entries.append({
+            'name': name,
+            'seconds': round(elapsed, 4),
+            'since_start': round(time.perf_counter() - _process_start, 4)
+        })
+
+def timed_import(module_name):
+    """Import a module, recording the time taken if this is its first import"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _record(_imports, module_name, started)
+    return module
+
+class LazyModule:
+    """Module proxy that performs the real (timed) import on first attribute access"""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = timed_import(self._module_name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._module_name} ({state})>"
+
+def lazy_import(module_name):
+    """Return a proxy for a module that is only imported when first used"""
+    return LazyModule(module_name)
+
+@contextmanager
+def timed_init(name):
+    """Time a one-off initializer (client setup, model load, ...)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(_initializers, name, started)
+
+def run_once(name, initializer):
+    """Run an initializer exactly once per process, timing it; later calls are no-ops"""
+    if name in _completed_inits:
+        return
+
+    with _report_lock:
+        lock = _init_locks.setdefault(name, threading.Lock())
+
+    with lock:
+        if name in _completed_inits:
+            return
+        with timed_init(name):
+            initializer()
+        _completed_inits.add(name)
+
+def mark_ready():
+    """Record the moment the app finished importing and can accept traffic"""
+    global _ready_seconds
+    _ready_seconds = round(time.perf_counter() - _process_start, 4)
+
+def startup_report():
+    """Per-import and per-initializer timings for this worker process"""
+    with _report_lock:
+        imports = sorted(_imports, key=lambda e: e['seconds'], reverse=True)
+        initializers = sorted(_initializers, key=lambda e: e['seconds'], reverse=True)
+
+    return {
+        'pid': os.getpid(),
+        'ready_seconds': _ready_seconds,
+        'uptime_seconds': round(time.perf_counter() - _process_start, 4),
+        'deferred_import_seconds': round(sum(e['seconds'] for e in imports), 4),
+        'initializer_seconds': round(sum(e['seconds'] for e in initializers), 4),
+        'imports': imports,
+        'initializers': initializers
+    }
+
+# ===== Shared Initializers =====
+def init_vertex_ai():
+    """Initialize the Vertex AI SDK once per process before the first Gemini call"""
+    def _init():
+        aiplatform = timed_import('google.cloud.aiplatform')
+        aiplatform.init(project=os.getenv('PROJECT_ID'), location='us-central1')
+
+    run_once('vertex_ai', _init)
@@ -243,7 +243,7 @@ async function sendMessage() {
         addUserMessage(question);
         const processingId = showProcessingMessage();
         
-        const response = await fetch('/api/chat/ask', {
+        const response = await fetch('/api/chat/ask-stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -252,22 +252,76 @@ async function sendMessage() {
             })
         });
         
-        // Remove processing message
-        if (document.getElementById(processingId)) {
-            document.getElementById(processingId).remove();
-        }
-        
         if (!response.ok) {
+            if (document.getElementById(processingId)) {
+                document.getElementById(processingId).remove();
+            }
             const errorData = await response.json().catch(() => ({}));
             throw new Error(errorData.error || errorData.message || 'Failed to get answer');
         }
         
-        const data = await response.json();
-        addBotMessage(data.answer || "Sorry, I couldn't find an answer.");
+        // Read Server-Sent Events from the response body and render tokens as they arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let bubble = null;
+        let debugData = null;
+        
+        const handleEvent = (event, data) => {
+            if (event === 'debug') {
+                debugData = data;
+            } else if (event === 'token') {
+                if (!bubble) {
+                    if (document.getElementById(processingId)) {
+                        document.getElementById(processingId).remove();
+                    }
+                    bubble = startBotMessage();
+                }
+                answer += data.text;
+                bubble.textContent = answer;
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            } else if (event === 'error') {
+                if (document.getElementById(processingId)) {
+                    document.getElementById(processingId).remove();
+                }
+                throw new Error(data.error || 'Failed to get answer');
+            }
+        };
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (data) handleEvent(event, JSON.parse(data));
+            }
+        }
+        
+        if (document.getElementById(processingId)) {
+            document.getElementById(processingId).remove();
+        }
+        
+        if (bubble) {
+            finishBotMessage(answer);
+        } else {
+            addBotMessage("Sorry, I couldn't find an answer.");
+        }
         
         // Add debug information as a collapsible section
-        if (data.debug) {
-            addDebugInfo(data.debug);
+        if (debugData) {
+            addDebugInfo(debugData);
         }
         
     } catch (error) {
@@ -342,6 +396,30 @@ function addDebugInfo(debugData) {
         renderHistory();
     }
 
+    // Start an empty bot bubble that a streamed answer is written into
+    function startBotMessage() {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message bot';
+        
+        const bubbleDiv = document.createElement('div');
+        bubbleDiv.className = 'bubble bot';
+        
+        messageDiv.appendChild(bubbleDiv);
+        chatContainer.appendChild(messageDiv);
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+        return bubbleDiv;
+    }
+
+    // Record a streamed answer in the chat history once it is complete
+    function finishBotMessage(content) {
+        state.chatHistory.push({
+            content,
+            sender: 'bot',
+            timestamp: new Date()
+        });
+        renderHistory();
+    }
+
     // Render a single message
     function renderMessage(message) {
         const messageDiv = document.createElement('div');
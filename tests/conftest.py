@@ -0,0 +1,41 @@
+import os
+import sys
+import hashlib
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bucket_manifest
+import pdf_cache
+
+BUCKET = 'test-bucket'
+
+@pytest.fixture
+def local_bucket(tmp_path, monkeypatch):
+    """A LOCAL_BUCKET_DIR with one chapter PDF, a fresh manifest registry and an empty PDF cache"""
+    root = tmp_path / 'buckets'
+    chapter = root / BUCKET / 'NCERT' / 'Class 10' / 'Maths' / 'Chapter_1.pdf'
+    chapter.parent.mkdir(parents=True)
+    chapter.write_bytes(b'%PDF-1.4 chapter one')
+
+    monkeypatch.setattr(bucket_manifest, 'LOCAL_BUCKET_DIR', str(root))
+    monkeypatch.setattr(bucket_manifest, '_manifests', {})
+    monkeypatch.setattr(pdf_cache, 'PDF_CACHE_DIR', str(tmp_path / 'pdf_cache'))
+    return root / BUCKET
+
+class FakeEmbeddingModel:
+    """Deterministic stand-in for the sentence-transformers model: same text, same vector"""
+
+    dimension = 8
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        rows = []
+        for text in texts:
+            digest = hashlib.sha256(text.encode('utf-8')).digest()
+            row = np.frombuffer(digest[:self.dimension], dtype=np.uint8).astype(np.float32) - 127.5
+            rows.append(row / np.linalg.norm(row))
+        return np.array(rows, dtype=np.float32)
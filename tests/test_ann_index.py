@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import ann_index
+from ann_index import IVFIndex, partition_key, partition_from_path
+
+CHAPTER_1 = 'NCERT/Class 10/Maths/Chapter_1.pdf'
+CHAPTER_2 = 'NCERT/Class 10/Maths/Chapter_2.pdf'
+
+def random_unit_vectors(count, dim=8, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def entries_of(source, count, generation=None):
+    return [{'source': source, 'generation': generation, 'chunk': i, 'text': f"{source} #{i}"} for i in range(count)]
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, 'INDEX_DIR', str(tmp_path / 'index'))
+    monkeypatch.setattr(ann_index, '_indexes', {})
+    monkeypatch.setattr(ann_index, '_index_mtimes', {})
+    return tmp_path / 'index'
+
+def test_partitions_ignore_spelling():
+    assert partition_key('NCERT', 'Class 10', 'Maths') == 'ncert_10_maths'
+    assert partition_from_path(CHAPTER_1) == 'ncert_10_maths'
+    assert partition_from_path('Chapter_1.pdf') is None
+
+def test_probing_every_list_finds_the_exact_nearest_rows():
+    vectors = random_unit_vectors(64)
+    index = IVFIndex(8)
+    index.add(vectors, entries_of(CHAPTER_1, 64))
+
+    query = vectors[17]
+    results = index.search(query, top_k=3, nprobe=len(index.centroids))
+
+    assert [entry['chunk'] for entry, _ in results] == list(np.argsort(-(vectors @ query))[:3])
+    assert results[0][1] == pytest.approx(1.0)
+
+def test_removing_a_source_keeps_the_others_searchable():
+    index = IVFIndex(8)
+    index.add(random_unit_vectors(20, seed=1), entries_of(CHAPTER_1, 20))
+    index.add(random_unit_vectors(20, seed=2), entries_of(CHAPTER_2, 20))
+
+    index.remove_source(CHAPTER_1)
+    results = index.search(random_unit_vectors(1, seed=3)[0], top_k=40, nprobe=len(index.centroids))
+
+    assert len(index) == 20
+    assert {entry['source'] for entry, _ in results} == {CHAPTER_2}
+
+def test_saved_index_loads_with_the_same_results(tmp_path):
+    index = IVFIndex(8)
+    index.add(random_unit_vectors(30), entries_of(CHAPTER_1, 30, generation=7))
+    index.save(str(tmp_path / 'partition.npz'))
+
+    loaded = IVFIndex.load(str(tmp_path / 'partition.npz'))
+    query = random_unit_vectors(1, seed=4)[0]
+
+    assert loaded.search(query, top_k=5) == index.search(query, top_k=5)
+    assert loaded.source_generations() == {CHAPTER_1: 7}
+
+def test_reindexing_a_new_generation_replaces_the_chapter(index_dir):
+    ann_index.index_chapter(CHAPTER_1, ['old'] * 4, random_unit_vectors(4, seed=1), generation=1)
+    assert ann_index.is_indexed(CHAPTER_1, 1)
+    assert not ann_index.is_indexed(CHAPTER_1, 2)
+    version = ann_index.partition_version('NCERT', 'Class 10', 'Maths')
+
+    ann_index.index_chapter(CHAPTER_1, ['new'] * 3, random_unit_vectors(3, seed=2), generation=2)
+
+    index = ann_index.get_index('ncert_10_maths')
+    assert ann_index.is_indexed(CHAPTER_1, 2)
+    assert len(index) == 3
+    assert {entry['text'] for entry in index.entries} == {'new'}
+    assert ann_index.partition_version('NCERT', 'Class 10', 'Maths') != version
@@ -0,0 +1,81 @@
+import time
+import numpy as np
+import pytest
+from answer_cache import SemanticAnswerCache
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'answers.sqlite3')
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def stored_rows(cache):
+    with cache._connect() as conn:
+        return dict(conn.execute("SELECT question, last_used FROM answers").fetchall())
+
+def test_similar_question_hits_and_distant_one_misses(cache_path):
+    cache = SemanticAnswerCache(path=cache_path, threshold=0.95)
+    cache.store('chapter#1', "What is photosynthesis?", unit(1, 0, 0), "Leaves make food.")
+
+    assert cache.lookup('chapter#1', "Define photosynthesis", unit(1, 0.1, 0)) == "Leaves make food."
+    assert cache.lookup('chapter#1', "What is respiration?", unit(0, 1, 0)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_scopes_are_kept_apart(cache_path):
+    cache = SemanticAnswerCache(path=cache_path)
+    cache.store('chapter#1', "What is photosynthesis?", unit(1, 0, 0), "Leaves make food.")
+
+    # A re-ingested chapter has a new generation and so a new scope
+    assert cache.lookup('chapter#2', "What is photosynthesis?", unit(1, 0, 0)) is None
+
+def test_without_embedding_only_same_text_matches(cache_path):
+    cache = SemanticAnswerCache(path=cache_path)
+    cache.store('chapter#1', "What is photosynthesis?", None, "Leaves make food.")
+
+    assert cache.lookup('chapter#1', "what is PHOTOSYNTHESIS") == "Leaves make food."
+    assert cache.lookup('chapter#1', "What is respiration?") is None
+
+def test_answers_stored_by_another_worker_are_found(cache_path):
+    writer = SemanticAnswerCache(path=cache_path)
+    reader = SemanticAnswerCache(path=cache_path)
+    assert reader.lookup('chapter#1', "What is photosynthesis?", unit(1, 0, 0)) is None
+
+    writer.store('chapter#1', "What is photosynthesis?", unit(1, 0, 0), "Leaves make food.")
+
+    assert reader.lookup('chapter#1', "What is photosynthesis?", unit(1, 0, 0)) == "Leaves make food."
+
+def test_hits_are_written_in_batches(cache_path):
+    cache = SemanticAnswerCache(path=cache_path, touch_interval=3600)
+    cache.store('chapter#1', "What is photosynthesis?", None, "Leaves make food.")
+    stored_at = stored_rows(cache)["What is photosynthesis?"]
+
+    cache.lookup('chapter#1', "What is photosynthesis?")
+    assert stored_rows(cache)["What is photosynthesis?"] == stored_at
+
+    # The next store carries the pending hit along
+    cache.store('chapter#1', "What is respiration?", None, "Cells release energy.")
+    assert stored_rows(cache)["What is photosynthesis?"] > stored_at
+
+def test_least_recently_used_answer_is_evicted(cache_path):
+    cache = SemanticAnswerCache(path=cache_path, max_entries=2, touch_interval=3600)
+    cache.store('chapter#1', "What is photosynthesis?", None, "Leaves make food.")
+    cache.store('chapter#1', "What is respiration?", None, "Cells release energy.")
+    cache.lookup('chapter#1', "What is photosynthesis?")
+
+    cache.store('chapter#1', "What is transpiration?", None, "Leaves lose water.")
+
+    assert set(stored_rows(cache)) == {"What is photosynthesis?", "What is transpiration?"}
+    assert cache.lookup('chapter#1', "What is respiration?") is None
+    assert cache.stats()['entries_in_memory'] == 2
+
+def test_expired_answers_are_not_served(cache_path, monkeypatch):
+    cache = SemanticAnswerCache(path=cache_path, ttl=60)
+    cache.store('chapter#1', "What is photosynthesis?", None, "Leaves make food.")
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, 'time', lambda: later)
+
+    assert cache.lookup('chapter#1', "What is photosynthesis?") is None
+    assert cache.stats()['entries_in_memory'] == 0
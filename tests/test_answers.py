@@ -0,0 +1,47 @@
+import pytest
+import answers
+from answer_cache import SemanticAnswerCache
+
+@pytest.fixture
+def answered(tmp_path, monkeypatch):
+    """Routes answers.py to a fresh cache and a fake Gemini; returns the questions it was asked"""
+    asked = []
+
+    def fake_generate(context, query, markdown=True):
+        asked.append((query, markdown))
+        return "**Photosynthesis**" if markdown else "Photosynthesis"
+
+    monkeypatch.setattr(answers, 'answer_cache', SemanticAnswerCache(path=str(tmp_path / 'answers.sqlite3')))
+    monkeypatch.setattr(answers, 'cache_embedding', lambda query: None)
+    monkeypatch.setattr(answers, 'generate_answer', fake_generate)
+    monkeypatch.setattr(answers.answer_flight, 'lock_dir', str(tmp_path / 'locks'))
+    return asked
+
+def test_plain_prompt_has_no_markdown_markers():
+    markdown = answers.build_answer_prompt("Leaves make food.", "What is photosynthesis?")
+    plain = answers.build_answer_prompt("Leaves make food.", "What is photosynthesis?", markdown=False)
+
+    assert "**Bold**" in markdown
+    assert "*" not in plain
+    assert "Bold for key terms" in plain
+
+def test_repeated_question_is_answered_from_cache(answered):
+    first = answers.generate_answer_cached('chapter', "Leaves make food.", "What is photosynthesis?")
+    second = answers.generate_answer_cached('chapter', "Leaves make food.", "what is PHOTOSYNTHESIS")
+
+    assert first == ("**Photosynthesis**", False)
+    assert second == ("**Photosynthesis**", True)
+    assert len(answered) == 1
+
+def test_formats_are_cached_apart(answered):
+    answers.generate_answer_cached('chapter', "Leaves make food.", "What is photosynthesis?")
+    plain = answers.generate_answer_cached('chapter', "Leaves make food.", "What is photosynthesis?", markdown=False)
+
+    assert plain == ("Photosynthesis", False)
+    assert [markdown for _, markdown in answered] == [True, False]
+
+def test_fallback_answers_are_not_cached(answered, monkeypatch):
+    monkeypatch.setattr(answers, 'generate_answer', lambda context, query, markdown=True: answers.ANSWER_ERROR)
+    answers.generate_answer_cached('chapter', "Leaves make food.", "What is photosynthesis?")
+
+    assert answers.answer_cache.lookup(answers.answer_cache_scope('chapter'), "What is photosynthesis?") is None
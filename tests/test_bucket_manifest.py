@@ -0,0 +1,25 @@
+import pytest
+import bucket_manifest
+from conftest import BUCKET
+
+CHAPTER = 'NCERT/Class 10/Maths/Chapter_1.pdf'
+
+def test_resolve_any_spelling(local_bucket):
+    for spelling in (CHAPTER, 'NCERT/class_10/maths/chapter (1).pdf', 'NCERT/Class 10/Maths/chapter 1.pdf'):
+        assert bucket_manifest.resolve_object_name(BUCKET, spelling) == CHAPTER
+
+def test_resolve_missing_raises(local_bucket):
+    with pytest.raises(FileNotFoundError):
+        bucket_manifest.resolve_object_name(BUCKET, 'NCERT/Class 10/Maths/Chapter_9.pdf')
+
+def test_miss_relists_for_new_upload(local_bucket):
+    manifest = bucket_manifest.BucketManifest(bucket_manifest.get_bucket(BUCKET), miss_refresh_interval=0)
+    assert manifest.resolve('NCERT/Class 10/Maths/Chapter_2.pdf') is None
+
+    (local_bucket / 'NCERT' / 'Class 10' / 'Maths' / 'Chapter_2.pdf').write_bytes(b'%PDF-1.4 chapter two')
+    assert manifest.resolve('NCERT/Class 10/Maths/chapter 2.pdf') == 'NCERT/Class 10/Maths/Chapter_2.pdf'
+
+def test_manifest_info_has_local_metadata(local_bucket):
+    info = bucket_manifest.get_manifest(BUCKET).info(bucket_manifest.resolve_object_name(BUCKET, CHAPTER))
+    assert info['size'] == len(b'%PDF-1.4 chapter one')
+    assert info['md5_hash'] and info['generation']
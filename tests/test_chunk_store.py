@@ -0,0 +1,94 @@
+import json
+import numpy as np
+import pytest
+import chunk_store
+from chunk_store import ChunkStore
+from conftest import FakeEmbeddingModel
+
+KEY = 'test-bucket/NCERT/Class 10/Maths/Chapter_1.pdf'
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkStore(path=str(tmp_path / 'chunk_store.sqlite3'))
+
+def chunks_of(*texts):
+    return [{'text': text, 'page': 1, 'start': 0, 'end': len(text)} for text in texts]
+
+def embeddings_of(count, value):
+    return np.full((count, 4), value, dtype=np.float32)
+
+def writer_with(store, generation, *texts):
+    writer = store.writer(KEY, 4)
+    writer.generation = generation
+    writer.append(chunks_of(*texts), embeddings_of(len(texts), generation))
+    return writer
+
+def stored_generations(store):
+    with store._connect() as conn:
+        return {row[0] for row in conn.execute("SELECT DISTINCT generation FROM chunks WHERE chapter_key = ?", (KEY,))}
+
+def test_uncommitted_writer_is_invisible(store):
+    assert store.write_chapter(KEY, chunks_of('old text'), embeddings_of(1, 0.5))
+    writer_with(store, store.chapter_info(KEY)['generation'] + 1, 'new text')
+
+    assert store.load(KEY)['chunks'] == ['old text']
+
+def test_commit_replaces_older_generation(store):
+    old = writer_with(store, 100, 'old text')
+    assert old.commit()
+    new = writer_with(store, 200, 'new text', 'more new text')
+    assert new.commit()
+
+    chapter = store.load(KEY)
+    assert chapter['generation'] == 200
+    assert chapter['chunks'] == ['new text', 'more new text']
+    assert stored_generations(store) == {200}
+
+def test_older_writer_loses_commit_race(store):
+    # Both writers started before either committed; the newer one lands first
+    older = writer_with(store, 100, 'stale text')
+    newer = writer_with(store, 200, 'fresh text')
+    assert newer.commit()
+
+    assert older.commit() is False
+    chapter = store.load(KEY)
+    assert chapter['generation'] == 200
+    assert chapter['chunks'] == ['fresh text']
+    assert stored_generations(store) == {200}
+
+def test_abort_drops_rows(store):
+    writer = writer_with(store, 100, 'never committed')
+    writer.abort()
+
+    assert store.load(KEY) is None
+    assert stored_generations(store) == set()
+
+def test_postings_follow_committed_generation(store):
+    writer_with(store, 100, 'photosynthesis in leaves').commit()
+    writer_with(store, 200, 'ohm law and resistance').commit()
+
+    chapter = store.load(KEY)
+    assert store.postings(KEY, chapter['generation'], {'photosynthesis'}) == {}
+    assert set(store.postings(KEY, chapter['generation'], {'resistance'})) == {'resistance'}
+
+def test_legacy_json_is_encoded_into_store(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(chunk_store, 'chunk_store', store)
+    monkeypatch.setattr(chunk_store, 'get_embedding_model', FakeEmbeddingModel)
+    legacy = tmp_path / 'legacy_chunks.json'
+    legacy.write_text(json.dumps(['first chunk', 'second chunk']))
+
+    assert chunk_store.import_legacy_json(KEY, str(legacy))
+    chapter = store.load(KEY)
+    assert chapter['chunks'] == ['first chunk', 'second chunk']
+    assert chapter['embeddings'].shape == (2, FakeEmbeddingModel.dimension)
+
+def test_empty_or_malformed_legacy_json_is_skipped(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(chunk_store, 'chunk_store', store)
+    empty = tmp_path / 'empty.json'
+    empty.write_text('')
+    malformed = tmp_path / 'malformed.json'
+    malformed.write_text('{"chunks": [')
+
+    assert not chunk_store.import_legacy_json(KEY, str(empty))
+    assert not chunk_store.import_legacy_json(KEY, str(malformed))
+    assert store.load(KEY) is None
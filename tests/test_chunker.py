@@ -0,0 +1,43 @@
+from chunker import split_sentences, chunk_page, chunk_pages
+
+def count_words(text):
+    return len(text.split())
+
+def test_sentences_are_split_without_surrounding_whitespace():
+    text = 'Plants make food. "Do animals?" No!\n\nNew block'
+    assert [text[start:end] for start, end in split_sentences(text)] == [
+        'Plants make food.', '"Do animals?"', 'No!', 'New block'
+    ]
+
+def test_chunks_fit_the_window_and_keep_offsets():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+    chunks = chunk_page(text, 3, count_words, max_tokens=6, overlap_tokens=0)
+
+    assert [chunk['text'] for chunk in chunks] == [
+        "One two three. Four five six.", "Seven eight nine. Ten eleven twelve."
+    ]
+    for chunk in chunks:
+        assert chunk['page'] == 3
+        assert text[chunk['start']:chunk['end']] == chunk['text']
+
+def test_consecutive_chunks_share_trailing_sentences():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+    chunks = chunk_page(text, 1, count_words, max_tokens=6, overlap_tokens=3)
+
+    assert [chunk['text'] for chunk in chunks] == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight nine.",
+        "Seven eight nine. Ten eleven twelve."
+    ]
+
+def test_overlong_sentence_is_split_between_words():
+    text = "one two three four five six seven"
+    chunks = chunk_page(text, 1, count_words, max_tokens=3, overlap_tokens=0)
+
+    assert [chunk['text'] for chunk in chunks] == ["one two three", "four five six", "seven"]
+    assert all(count_words(chunk['text']) <= 3 for chunk in chunks)
+
+def test_blank_pages_are_skipped_and_pages_numbered_from_one():
+    chunks = list(chunk_pages(["First page.", "   ", "Third page."], count_words, max_tokens=10))
+
+    assert [(chunk['page'], chunk['text']) for chunk in chunks] == [(1, "First page."), (3, "Third page.")]
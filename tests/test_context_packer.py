@@ -0,0 +1,44 @@
+import pytest
+import retrieval
+from context_packer import pack_context
+
+@pytest.fixture(autouse=True)
+def word_count_tokens(monkeypatch):
+    """bm25 mode counts tokens with the word estimate, so no embedding model is loaded"""
+    monkeypatch.setattr(retrieval, 'RETRIEVAL_MODE', 'bm25')
+
+def test_repeated_sentences_of_overlapping_chunks_are_kept_once():
+    ranked = [("Ohm's law relates voltage and current. Resistance opposes current.", 0.9),
+              ("Resistance opposes current. Copper conducts well.", 0.8)]
+
+    context, stats = pack_context(ranked, 1000)
+
+    assert context == "Ohm's law relates voltage and current. Resistance opposes current. Copper conducts well."
+    assert stats['duplicates_removed'] == 1
+    assert stats['sentences'] == 3
+
+def test_near_duplicate_sentences_are_dropped():
+    ranked = [("The current flows through the wire.", 0.9), ("Current flows through a wire.", 0.8)]
+
+    context, stats = pack_context(ranked, 1000)
+
+    assert context == "The current flows through the wire."
+    assert stats['duplicates_removed'] == 1
+
+def test_budget_keeps_the_sentences_matching_the_question():
+    ranked = [("Plants make food in their leaves. Ohm's law relates voltage and current.", 0.5)]
+
+    context, stats = pack_context(ranked, 8, "What is Ohm's law?")
+
+    assert context == "Ohm's law relates voltage and current."
+    assert stats['context_tokens'] <= 8
+
+def test_kept_sentences_return_to_reading_order():
+    ranked = [("Voltage is measured in volts. Ohm's law links voltage and current.", 0.5)]
+
+    context, _ = pack_context(ranked, 1000, "What is Ohm's law?")
+
+    assert context == "Voltage is measured in volts. Ohm's law links voltage and current."
+
+def test_nothing_to_pack():
+    assert pack_context([], 100) == ("", {'budget': 100, 'context_tokens': 0, 'sentences': 0, 'duplicates_removed': 0})
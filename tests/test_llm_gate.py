@@ -0,0 +1,135 @@
+import time
+import threading
+import pytest
+from llm_gate import LLMGate, LLMUnavailable
+
+def make_gate(**kwargs):
+    settings = dict(max_concurrency=2, queue_timeout=0.05, max_attempts=1, retry_base=0,
+                    breaker_threshold=2, breaker_cooldown=0.1)
+    settings.update(kwargs)
+    return LLMGate(**settings)
+
+def failing():
+    raise ConnectionError('upstream down')
+
+def open_breaker(gate):
+    for _ in range(gate.breaker_threshold):
+        with pytest.raises(ConnectionError):
+            gate.call(failing)
+    assert gate.stats()['state'] == 'open'
+
+def test_breaker_opens_after_consecutive_transient_failures():
+    gate = make_gate()
+    open_breaker(gate)
+
+    calls = []
+    with pytest.raises(LLMUnavailable) as refused:
+        gate.call(lambda: calls.append(1))
+    assert refused.value.reason == 'circuit_open'
+    assert calls == []
+    assert gate.stats()['rejected_circuit_open'] == 1
+
+def test_successful_trial_closes_breaker():
+    gate = make_gate()
+    open_breaker(gate)
+    time.sleep(gate.breaker_cooldown)
+
+    assert gate.call(lambda: 'ok') == 'ok'
+    stats = gate.stats()
+    assert stats['state'] == 'closed'
+    assert stats['consecutive_failures'] == 0
+
+def test_failed_trial_reopens_breaker():
+    gate = make_gate()
+    open_breaker(gate)
+    time.sleep(gate.breaker_cooldown)
+
+    with pytest.raises(ConnectionError):
+        gate.call(failing)
+    assert gate.stats()['state'] == 'open'
+    with pytest.raises(LLMUnavailable):
+        gate.call(lambda: 'ok')
+
+def test_only_one_trial_while_half_open():
+    gate = make_gate()
+    open_breaker(gate)
+    time.sleep(gate.breaker_cooldown)
+    in_trial = threading.Event()
+    release = threading.Event()
+
+    def slow_trial():
+        in_trial.set()
+        release.wait()
+        return 'ok'
+
+    trial = threading.Thread(target=gate.call, args=(slow_trial,))
+    trial.start()
+    in_trial.wait()
+    try:
+        with pytest.raises(LLMUnavailable):
+            gate.call(lambda: 'ok')
+    finally:
+        release.set()
+        trial.join()
+    assert gate.stats()['state'] == 'closed'
+
+def test_non_transient_errors_do_not_open_breaker():
+    gate = make_gate()
+
+    def bad_request():
+        raise ValueError('blocked prompt')
+
+    for _ in range(gate.breaker_threshold + 1):
+        with pytest.raises(ValueError):
+            gate.call(bad_request)
+    assert gate.stats()['state'] == 'closed'
+
+def test_transient_error_is_retried():
+    gate = make_gate(max_attempts=3, breaker_threshold=5)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise TimeoutError('slow upstream')
+        return 'ok'
+
+    assert gate.call(flaky) == 'ok'
+    assert gate.stats()['retries'] == 2
+
+def test_stream_is_not_retried_after_first_item():
+    gate = make_gate(max_attempts=3, breaker_threshold=5)
+    attempts = []
+
+    def broken_stream():
+        attempts.append(1)
+        yield 'partial'
+        raise ConnectionError('dropped mid-answer')
+
+    received = []
+    with pytest.raises(ConnectionError):
+        for item in gate.stream(broken_stream):
+            received.append(item)
+    assert received == ['partial']
+    assert attempts == [1]
+
+def test_queue_timeout_when_all_slots_busy():
+    gate = make_gate(max_concurrency=1)
+    busy = threading.Event()
+    release = threading.Event()
+
+    def hold_slot():
+        busy.set()
+        release.wait()
+
+    holder = threading.Thread(target=gate.call, args=(hold_slot,))
+    holder.start()
+    busy.wait()
+    try:
+        with pytest.raises(LLMUnavailable) as refused:
+            gate.call(lambda: 'ok')
+        assert refused.value.reason == 'queue_timeout'
+    finally:
+        release.set()
+        holder.join()
+    assert gate.stats()['in_flight'] == 0
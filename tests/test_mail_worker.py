@@ -0,0 +1,102 @@
+import socketserver
+import threading
+import pytest
+from flask import Flask
+from flask_mail import Mail, Message
+from mail_worker import MailQueue
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server for smtplib: records messages, refuses the first `refuse` of them"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.refuse = 0
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost ready")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply("221 bye")
+                return
+            if command in ('EHLO', 'HELO'):
+                self.reply("250 localhost")
+            elif command == 'MAIL' and server.refuse:
+                server.refuse -= 1
+                self.reply("421 try again later")
+                return
+            elif command == 'DATA':
+                self.reply("354 end with .")
+                body = []
+                for data in iter(self.rfile.readline, b''):
+                    if data.rstrip(b'\r\n') == b'.':
+                        break
+                    body.append(data.decode())
+                server.messages.append(''.join(body))
+                self.reply("250 queued")
+            else:
+                # MAIL, RCPT, RSET and NOOP
+                self.reply("250 ok")
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def mail_queue(smtp_server):
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=smtp_server.server_address[1], MAIL_USE_TLS=False,
+                      MAIL_USE_SSL=False, MAIL_DEFAULT_SENDER='tutor@example.com')
+    mail_queue = MailQueue(app, Mail(app), retry_base=0.01)
+    # Messages are built inside a request in the app, which gives them their default sender
+    with app.app_context():
+        yield mail_queue
+    mail_queue.close(timeout=5)
+
+def message(subject):
+    return Message(subject, recipients=['student@example.com'], body=f"{subject} body")
+
+def test_queued_messages_share_one_connection(mail_queue, smtp_server):
+    for i in range(3):
+        mail_queue.send(message(f"OTP {i}"))
+    mail_queue.close(timeout=5)
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connections == 1
+    assert mail_queue.stats()['sent'] == 3
+
+def test_refused_message_is_retried_on_a_new_connection(mail_queue, smtp_server):
+    smtp_server.refuse = 1
+    mail_queue.send(message("Password reset"))
+    mail_queue.close(timeout=5)
+
+    stats = mail_queue.stats()
+    assert len(smtp_server.messages) == 1
+    assert "Password reset" in smtp_server.messages[0]
+    assert (stats['sent'], stats['retries'], stats['connections']) == (1, 1, 2)
+
+def test_message_is_dropped_after_max_attempts(mail_queue, smtp_server):
+    mail_queue.max_attempts = 2
+    smtp_server.refuse = 2
+    mail_queue.send(message("OTP"))
+    mail_queue.close(timeout=5)
+
+    stats = mail_queue.stats()
+    assert smtp_server.messages == []
+    assert (stats['sent'], stats['failed'], stats['pending']) == (0, 1, 0)
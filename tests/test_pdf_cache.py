@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import bucket_manifest
+import pdf_cache
+from conftest import BUCKET
+
+CHAPTER = 'NCERT/Class 10/Maths/Chapter_1.pdf'
+
+def test_downloads_once(local_bucket):
+    before = pdf_cache.pdf_cache_stats()
+    bucket_manifest.resolve_object_name(BUCKET, CHAPTER)
+
+    path = pdf_cache.fetch_pdf_path(BUCKET, CHAPTER)
+    assert pdf_cache.fetch_pdf_path(BUCKET, CHAPTER) == path
+    with open(path, 'rb') as f:
+        assert f.read() == b'%PDF-1.4 chapter one'
+
+    after = pdf_cache.pdf_cache_stats()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
+
+def test_new_version_gets_new_entry(local_bucket):
+    old_path = pdf_cache.fetch_pdf_path(BUCKET, CHAPTER)
+
+    (local_bucket / CHAPTER).write_bytes(b'%PDF-1.4 chapter one, revised')
+    bucket_manifest.get_manifest(BUCKET).refresh()
+    new_path = pdf_cache.fetch_pdf_path(BUCKET, CHAPTER)
+
+    assert new_path != old_path
+    with open(new_path, 'rb') as f:
+        assert f.read() == b'%PDF-1.4 chapter one, revised'
+
+def test_evicts_least_recently_used(local_bucket, monkeypatch):
+    other = 'NCERT/Class 10/Maths/Chapter_2.pdf'
+    (local_bucket / other).write_bytes(b'%PDF-1.4 chapter two')
+    monkeypatch.setattr(pdf_cache, 'PDF_CACHE_MAX_BYTES', len(b'%PDF-1.4 chapter two'))
+
+    first = pdf_cache.fetch_pdf_path(BUCKET, CHAPTER)
+    os.utime(first, (1, 1))
+    second = pdf_cache.fetch_pdf_path(BUCKET, other)
+
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+
+def test_concurrent_fetches_share_one_download(local_bucket):
+    before = pdf_cache.pdf_cache_stats()
+    bucket_manifest.resolve_object_name(BUCKET, CHAPTER)
+
+    with ThreadPoolExecutor(8) as pool:
+        paths = set(pool.map(lambda _: pdf_cache.fetch_pdf_path(BUCKET, CHAPTER), range(8)))
+
+    assert len(paths) == 1
+    assert pdf_cache.pdf_cache_stats()['misses'] - before['misses'] == 1
@@ -0,0 +1,86 @@
+import time
+import pytest
+import quiz_bank
+from quiz_bank import QuizBank, bank_key
+
+PARAMS = ('NCERT', 'Class 10', 'Maths', 'Chapter 1', 'Medium')
+
+class FakeGenerator:
+    """Returns rounds of new, uniquely worded questions and counts the rounds"""
+
+    def __init__(self, per_round=10, prefix='Question'):
+        self.per_round = per_round
+        self.prefix = prefix
+        self.rounds = 0
+
+    def __call__(self, *params):
+        self.rounds += 1
+        return [{'question': f"{self.prefix} {self.rounds}-{i}?", 'options': ['a', 'b', 'c', 'd'], 'correctAnswer': 0}
+                for i in range(self.per_round)]
+
+@pytest.fixture(autouse=True)
+def isolated_flight(tmp_path, monkeypatch):
+    monkeypatch.setattr(quiz_bank.quiz_flight, 'lock_dir', str(tmp_path / 'locks'))
+
+def make_bank(tmp_path, generate, **kwargs):
+    settings = dict(target=30, low_watermark=20, max_serves=2)
+    settings.update(kwargs)
+    return QuizBank(generate, path=str(tmp_path / 'quiz_bank.sqlite3'), **settings)
+
+def wait_for_pool(bank, size, timeout=5):
+    deadline = time.monotonic() + timeout
+    while bank.pool_size(bank_key(*PARAMS)) < size:
+        assert time.monotonic() < deadline, "background refill did not finish"
+        time.sleep(0.01)
+
+def wait_for_refills(bank, timeout=5):
+    deadline = time.monotonic() + timeout
+    while bank._refilling:
+        assert time.monotonic() < deadline, "background refill did not finish"
+        time.sleep(0.01)
+
+def test_bank_key_normalizes_request():
+    assert bank_key(*PARAMS) == 'ncert|10|maths|1|medium'
+
+def test_cold_pool_generates_then_refills_to_target(tmp_path):
+    generate = FakeGenerator()
+    bank = make_bank(tmp_path, generate)
+
+    assert len(bank.sample(*PARAMS)) == 10
+    wait_for_pool(bank, 30)
+    assert generate.rounds == 3
+
+def test_full_pool_is_served_without_generating(tmp_path):
+    generate = FakeGenerator()
+    bank = make_bank(tmp_path, generate, max_serves=100)
+    bank.add_questions(bank_key(*PARAMS), FakeGenerator(per_round=30)())
+
+    for _ in range(5):
+        assert len(bank.sample(*PARAMS)) == 10
+    assert generate.rounds == 0
+
+def test_served_questions_retire_and_pool_refills(tmp_path):
+    generate = FakeGenerator()
+    bank = make_bank(tmp_path, generate)
+    key = bank_key(*PARAMS)
+    bank.add_questions(key, FakeGenerator(per_round=30)())
+
+    # 30 questions at two serves each last six quizzes at most; the pool is
+    # topped up before that, once fewer than 20 can still be served
+    for _ in range(6):
+        assert len(bank.sample(*PARAMS)) == 10
+    wait_for_refills(bank)
+    assert generate.rounds > 0
+    assert bank.pool_size(key) >= 20
+
+
+def test_old_questions_expire(tmp_path):
+    generate = FakeGenerator()
+    bank = make_bank(tmp_path, generate, ttl=0.05)
+    key = bank_key(*PARAMS)
+    bank.add_questions(key, FakeGenerator(per_round=30, prefix='Stale')())
+    time.sleep(0.1)
+
+    assert bank.pool_size(key) == 0
+    questions = bank.sample(*PARAMS)
+    assert not any(q['question'].startswith('Stale') for q in questions)
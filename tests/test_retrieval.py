@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import retrieval
+from chunk_store import ChunkStore
+from lexical_index import (tokenize, add_chunk, encode_postings, decode_postings, bm25_scores,
+                           top_scored, reciprocal_rank_fusion)
+
+KEY = 'test-bucket/NCERT/Class 10/Science/Chapter_1.pdf'
+CHUNKS = [
+    "Ohm's law relates voltage and current.",
+    "Plants make food by photosynthesis.",
+    "Resistance opposes the current in wires."
+]
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+@pytest.fixture
+def chapter(tmp_path, monkeypatch):
+    """A stored three-chunk chapter whose query embedding sits closest to the resistance chunk"""
+    store = ChunkStore(path=str(tmp_path / 'chunk_store.sqlite3'))
+    embeddings = np.vstack([unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)])
+    store.write_chapter(KEY, [{'text': text} for text in CHUNKS], embeddings)
+    monkeypatch.setattr(retrieval, 'chunk_store', store)
+    monkeypatch.setattr(retrieval, 'encode_query', lambda query: unit(0.1, 0, 1))
+    return store.load(KEY)
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("Ohm's laws in this class") == ['ohm', 'law', 'class']
+
+def test_bm25_prefers_rare_terms_and_skips_unmatched_chunks():
+    postings, lengths = {}, []
+    for idx, text in enumerate(["current current voltage", "current flows", "plants grow"]):
+        add_chunk(postings, lengths, idx, text)
+    query = {term: decode_postings(encode_postings(*postings[term])) for term in ('current', 'voltage')}
+
+    scores = bm25_scores(query, lengths)
+    indices, best = top_scored(scores, 3)
+
+    assert list(indices) == [0, 1]
+    assert scores[2] == 0
+    assert best[0] > best[1]
+
+def test_reciprocal_rank_fusion_sums_over_rankings():
+    fused = reciprocal_rank_fusion([[3, 1], [1]], k=60)
+
+    assert fused[1] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[3] == pytest.approx(1 / 61)
+
+def test_dense_mode_follows_the_embedding(chapter):
+    assert [i for i, _ in retrieval.rank_chunks(chapter, "define ohm law", 3, mode='dense')] == [2, 0, 1]
+
+def test_prefilter_mode_scores_only_lexical_candidates(chapter):
+    # Only the first chunk names "ohm", so the closer resistance chunk is never scored
+    assert [i for i, _ in retrieval.rank_chunks(chapter, "define ohm law", 1, mode='prefilter')] == [0]
+
+def test_bm25_mode_scores_relative_to_the_best_hit(chapter):
+    assert retrieval.rank_chunks(chapter, "define ohm law", 3, mode='bm25') == [(0, 1.0)]
+
+def test_hybrid_mode_fuses_both_rankings(chapter):
+    ranked = retrieval.rank_chunks(chapter, "define ohm law", 3, mode='hybrid')
+
+    # The keyword match ranks first even though its embedding is only second
+    assert [i for i, _ in ranked] == [0, 2, 1]
+    assert all(0 < score <= 1.0 for _, score in ranked)
+
+def test_retrieve_returns_chunk_text(chapter):
+    assert retrieval.retrieve(chapter, "define ohm law", top_k=1, mode='bm25') == [(CHUNKS[0], 1.0)]
+    assert retrieval.retrieve(chapter, "", top_k=1) == []
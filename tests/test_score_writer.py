@@ -0,0 +1,139 @@
+import types
+import pytest
+import score_writer
+from score_writer import ScoreWriter
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref, data, merge))
+
+    def commit(self):
+        if self.db.failures_left:
+            self.db.failures_left -= 1
+            raise ConnectionError('Firestore unavailable')
+        self.db.committed.append(self.writes)
+
+class FakeDB:
+    """Collects committed batches; the first failures_left commits raise"""
+
+    def __init__(self, failures=0):
+        self.failures_left = failures
+        self.committed = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, name):
+        return types.SimpleNamespace(document=lambda uid: f"{name}/{uid}")
+
+    def writes(self):
+        return [write for batch in self.committed for write in batch]
+
+@pytest.fixture(autouse=True)
+def fake_firestore(monkeypatch):
+    monkeypatch.setattr(score_writer, 'firestore', types.SimpleNamespace(ArrayUnion=list))
+
+def make_writer(db, **kwargs):
+    # A long interval keeps the background thread out of the way; the tests flush
+    settings = dict(interval=3600, max_users=100, max_attempts=3)
+    settings.update(kwargs)
+    writer = ScoreWriter(lambda: db, **settings)
+    writer._log_error = lambda message: None
+    return writer
+
+def test_scores_of_one_user_become_one_write():
+    db = FakeDB()
+    writer = make_writer(db)
+    writer.submit('u1', 'Maths', 7)
+    writer.submit('u1', 'Maths', 9)
+    writer.submit('u1', 'Science', 5)
+    writer.flush()
+
+    [(ref, data, merge)] = db.writes()
+    assert ref == 'users/u1' and merge
+    assert data['scores'] == {'Maths': 9, 'Science': 5}
+    assert [entry['score'] for entry in data['scoreHistory']['Maths']] == [7, 9]
+    writer.close()
+
+def test_zero_interval_writes_inline():
+    db = FakeDB()
+    writer = make_writer(db, interval=0)
+    writer.submit('u1', 'Maths', 7)
+
+    assert len(db.writes()) == 1
+    assert writer.stats()['pending_users'] == 0
+
+def test_failed_batch_is_requeued_and_retried():
+    db = FakeDB(failures=1)
+    writer = make_writer(db)
+    writer.submit('u1', 'Maths', 7)
+    writer.flush()
+
+    assert db.writes() == []
+    assert writer.stats()['pending_users'] == 1
+
+    writer.flush()
+    [(_, data, _)] = db.writes()
+    assert data['scores'] == {'Maths': 7}
+    assert writer.stats()['failed_batches'] == 1
+    writer.close()
+
+def test_newer_scores_win_over_requeued_ones():
+    db = FakeDB(failures=1)
+    writer = make_writer(db)
+    writer.submit('u1', 'Maths', 7)
+    writer.flush()
+    writer.submit('u1', 'Maths', 9)
+    writer.flush()
+
+    [(_, data, _)] = db.writes()
+    assert data['scores'] == {'Maths': 9}
+    assert [entry['score'] for entry in data['scoreHistory']['Maths']] == [7, 9]
+    writer.close()
+
+def test_scores_dropped_after_max_attempts():
+    db = FakeDB(failures=10)
+    writer = make_writer(db, max_attempts=2)
+    writer.submit('u1', 'Maths', 7)
+    writer.flush()
+    writer.flush()
+
+    stats = writer.stats()
+    assert stats['dropped_users'] == 1
+    assert stats['pending_users'] == 0
+
+def test_close_flushes_pending_scores():
+    db = FakeDB()
+    writer = make_writer(db)
+    writer.submit('u1', 'Maths', 7)
+    writer.close()
+
+    assert len(db.writes()) == 1
+
+def test_unreachable_firestore_keeps_scores():
+    db = FakeDB()
+    connections = []
+
+    def get_db():
+        connections.append(1)
+        if len(connections) == 1:
+            raise ValueError('Firebase credentials not found')
+        return db
+
+    writer = ScoreWriter(get_db, interval=3600, max_attempts=3)
+    writer._log_error = lambda message: None
+    writer.submit('u1', 'Maths', 7)
+    writer.flush()
+
+    stats = writer.stats()
+    assert stats['pending_users'] == 1
+    assert stats['dropped_users'] == 0
+
+    writer.flush()
+    [(_, data, _)] = db.writes()
+    assert data['scores'] == {'Maths': 7}
+    writer.close()
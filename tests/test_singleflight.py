@@ -0,0 +1,114 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import file_lock
+from singleflight import SingleFlight
+
+pytestmark = pytest.mark.skipif(not file_lock.CROSS_PROCESS, reason="needs fcntl")
+
+@pytest.fixture
+def flight(tmp_path):
+    return SingleFlight('test', lock_dir=str(tmp_path), stripes=8, wait_timeout=5)
+
+def hold_lock(path, release):
+    """Hold a lock file from another open file description, as another worker process would"""
+    held = threading.Event()
+
+    def run():
+        with file_lock.locked(path):
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    held.wait()
+    return thread
+
+def test_concurrent_callers_share_one_call(flight):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'answer'
+
+    with ThreadPoolExecutor(5) as pool:
+        leader = pool.submit(flight.do, 'key', compute)
+        started.wait()
+        followers = [pool.submit(flight.do, 'key', compute) for _ in range(4)]
+        while flight.stats()['coalesced'] < 4:
+            time.sleep(0.01)
+        release.set()
+
+    assert leader.result() == ('answer', False)
+    assert [f.result() for f in followers] == [('answer', True)] * 4
+    assert len(calls) == 1
+    assert flight.stats()['in_flight'] == 0
+
+def test_error_reaches_every_waiter(flight):
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait()
+        raise ValueError('upstream failed')
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'key', compute)
+        started.wait()
+        follower = pool.submit(flight.do, 'key', compute)
+        while flight.stats()['coalesced'] < 1:
+            time.sleep(0.01)
+        release.set()
+
+    for future in (leader, follower):
+        with pytest.raises(ValueError):
+            future.result()
+    # A later call computes again
+    assert flight.do('key', lambda: 'retried') == ('retried', False)
+
+def test_waiter_uses_result_stored_by_other_process(flight):
+    release = threading.Event()
+    holder = hold_lock(flight._lock_path('key'), release)
+    calls = []
+
+    with ThreadPoolExecutor(1) as pool:
+        result = pool.submit(flight.do, 'key', lambda: calls.append(1), recheck=lambda: 'stored elsewhere')
+        time.sleep(0.1)
+        release.set()
+        holder.join()
+
+        assert result.result() == ('stored elsewhere', True)
+    assert calls == []
+    stats = flight.stats()
+    assert stats['waited_on_process'] == 1
+    assert stats['shared_across_processes'] == 1
+
+def test_waiter_computes_when_other_process_stored_nothing(flight):
+    release = threading.Event()
+    holder = hold_lock(flight._lock_path('key'), release)
+
+    with ThreadPoolExecutor(1) as pool:
+        result = pool.submit(flight.do, 'key', lambda: 'computed', recheck=lambda: None)
+        time.sleep(0.1)
+        release.set()
+        holder.join()
+
+        assert result.result() == ('computed', False)
+    assert flight.stats()['waited_on_process'] == 1
+
+def test_lock_timeout_computes_anyway(tmp_path):
+    flight = SingleFlight('test', lock_dir=str(tmp_path), stripes=8, wait_timeout=0.1)
+    release = threading.Event()
+    holder = hold_lock(flight._lock_path('key'), release)
+    try:
+        assert flight.do('key', lambda: 'computed') == ('computed', False)
+    finally:
+        release.set()
+        holder.join()
+    assert flight.stats()['lock_timeouts'] == 1